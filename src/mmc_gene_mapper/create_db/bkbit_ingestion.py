@@ -14,7 +14,8 @@ import mmc_gene_mapper.query_db.query as query_utils
 
 def ingest_bkbit_genes(
         db_path,
-        bkbit_path):
+        bkbit_path,
+        unsafe_fast_writes=False):
     """
     Ingest gene info from a bkbit jsonld file into the gene
     table of the database
@@ -25,6 +26,10 @@ def ingest_bkbit_genes(
         path to the database into which we are ingesting
     bkbit_path:
         path to the jsonld file with the data being ingested
+    unsafe_fast_writes:
+        passed to create_db.utils.tune_build_connection; only
+        pass True if db_path is a temporary database that will
+        be discarded should this fail
 
     Returns
     -------
@@ -48,6 +53,10 @@ def ingest_bkbit_genes(
     )
 
     with sqlite3.connect(db_path) as conn:
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
         citation_idx = metadata_utils.insert_unique_citation(
             conn=conn,
             name=citation_name,
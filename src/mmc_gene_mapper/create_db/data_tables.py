@@ -100,18 +100,22 @@ def create_gene_index(cursor):
         )
     )
 
+    # authority and species_taxon are included in these indexes
+    # so that species detection (which groups matches on symbol or
+    # identifier by authority and species) can be answered from
+    # the index alone
     db_utils.create_index(
         cursor=cursor,
         idx_name="gene_validity_idx0",
         table_name="gene",
-        column_tuple=("symbol",)
+        column_tuple=("symbol", "authority", "species_taxon")
     )
 
     db_utils.create_index(
         cursor=cursor,
         idx_name="gene_validity_idx1",
         table_name="gene",
-        column_tuple=("identifier",)
+        column_tuple=("identifier", "authority", "species_taxon")
     )
 
 
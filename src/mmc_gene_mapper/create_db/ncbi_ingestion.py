@@ -15,7 +15,8 @@ def ingest_ncbi_data(
         db_path,
         download_manager,
         clobber=True,
-        force_download=False):
+        force_download=False,
+        unsafe_fast_writes=False):
 
     metadata_dict = dict()
     host = 'ftp.ncbi.nlm.nih.gov'
@@ -45,7 +46,8 @@ def ingest_ncbi_data(
         ortholog_path=ortholog_path,
         metadata_dict=metadata_dict,
         clobber=clobber,
-        citation_name='NCBI'
+        citation_name='NCBI',
+        unsafe_fast_writes=unsafe_fast_writes
     )
 
 
@@ -56,7 +58,8 @@ def _ingest_ncbi_data(
         ensembl_path,
         metadata_dict,
         clobber=False,
-        citation_name='NCBI'):
+        citation_name='NCBI',
+        unsafe_fast_writes=False):
 
     file_utils.assert_is_file(ensembl_path)
     file_utils.assert_is_file(ortholog_path)
@@ -68,6 +71,10 @@ def _ingest_ncbi_data(
         db_exists = True
 
     with sqlite3.connect(db_path) as conn:
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
         if not db_exists:
             data_utils.create_data_tables(conn)
             metadata_utils.create_metadata_tables(conn)
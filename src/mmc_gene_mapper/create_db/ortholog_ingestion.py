@@ -23,7 +23,8 @@ def ingest_hmba_orthologs(
         ortholog_id_column='ortholog_id',
         gene_authority='NCBI',
         clobber=False,
-        chunk_size=1000):
+        chunk_size=1000,
+        unsafe_fast_writes=False):
     """
     Ingest orthologs from a CSV file containing a primary_id
     column and a ortholog_id column
@@ -52,6 +53,10 @@ def ingest_hmba_orthologs(
     chunk_size:
         the number of genes to ingest at a time (to avoid overwhelming
         machine memory in the case of large files)
+    unsafe_fast_writes:
+        passed to create_db.utils.tune_build_connection; only
+        pass True if db_path is a temporary database that will
+        be discarded should this fail
 
     Returns
     -------
@@ -88,6 +93,10 @@ def ingest_hmba_orthologs(
     gene0_list = [int(ii) for ii in df[primary_id_column].values]
     gene1_list = [int(ii) for ii in df[ortholog_id_column].values]
     with sqlite3.connect(db_path) as conn:
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
 
         ingest_orthologs_creating_citation(
             conn=conn,
@@ -8,13 +8,15 @@ import tarfile
 import tempfile
 
 import mmc_gene_mapper.utils.file_utils as file_utils
+import mmc_gene_mapper.create_db.utils as db_utils
 
 
 def ingest_species_data(
         db_path,
         download_manager,
         force_download=False,
-        tmp_dir=None):
+        tmp_dir=None,
+        unsafe_fast_writes=False):
 
     tmp_dir = pathlib.Path(
         tempfile.mkdtemp(dir=tmp_dir)
@@ -30,7 +32,8 @@ def ingest_species_data(
             db_path=db_path,
             download_manager=download_manager,
             force_download=force_download,
-            tmp_dir=tmp_dir
+            tmp_dir=tmp_dir,
+            unsafe_fast_writes=unsafe_fast_writes
         )
     finally:
         file_utils.clean_up(tmp_dir)
@@ -40,7 +43,8 @@ def _ingest_species_data(
         db_path,
         download_manager,
         force_download,
-        tmp_dir):
+        tmp_dir,
+        unsafe_fast_writes=False):
 
     db_path = pathlib.Path(db_path)
     if db_path.exists():
@@ -94,12 +98,22 @@ def _ingest_species_data(
 
     ingest_species_table(
         db_path=db_path,
-        data_path=name_path)
+        data_path=name_path,
+        unsafe_fast_writes=unsafe_fast_writes)
 
 
 def ingest_species_table(
         db_path,
-        data_path):
+        data_path,
+        unsafe_fast_writes=False):
+    """
+    Populate the NCBI_species table from the names.dmp file
+    at data_path.
+
+    unsafe_fast_writes is passed to
+    create_db.utils.tune_build_connection (only pass True if
+    db_path is a temporary database).
+    """
 
     species = []
     with open(data_path, "r") as src:
@@ -110,6 +124,10 @@ def ingest_species_table(
     table_name = "NCBI_species"
     index_name = "NCBI_species_idx"
     with sqlite3.connect(db_path) as conn:
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
         cursor = conn.cursor()
         cursor.execute(
             f"DROP INDEX IF EXISTS {index_name}"
@@ -45,6 +45,34 @@ def create_index(
         )
 
 
+def tune_build_connection(conn, unsafe_fast_writes=False):
+    """
+    Set the PRAGMAs for a sqlite3 connection that is being
+    used to build (bulk write to) a database.
+
+    Parameters
+    ----------
+    conn:
+        a sqlite3 connection
+    unsafe_fast_writes:
+        if True, do not fsync after every transaction
+        (synchronous=OFF). A crash while writing can then
+        corrupt the database, so only pass True for a
+        temporary database that is moved into place once it
+        is complete (as MMCGeneMapper.create_mapper does).
+
+    Notes
+    -----
+    WAL mode is not used since the journal mode would persist
+    in the final database file.
+    """
+    cursor = conn.cursor()
+    if unsafe_fast_writes:
+        cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-262144")
+
+
 def check_existence(db_path):
     """
     Check that the file at db_path exists.
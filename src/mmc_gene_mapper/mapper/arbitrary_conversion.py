@@ -31,7 +31,8 @@ def arbitrary_mapping(
         dst_authority,
         ortholog_citation='NCBI',
         log=None,
-        invalid_mapping_prefix=None):
+        invalid_mapping_prefix=None,
+        species_cache=None):
     """
     Parameters
     ----------
@@ -53,6 +54,9 @@ def arbitrary_mapping(
     invalid_mapping_prefix:
         an optional string. If not None, this will be prepended
         to the placeholder names of all unmappable genes
+    species_cache:
+        an optional species_detection.SpeciesLookupCache in
+        which to cache the species detection lookups
     """
     if log is None:
         log = log_class.StdoutLog()
@@ -99,7 +103,8 @@ def arbitrary_mapping(
         gene_list=gene_list,
         guess_taxon=dst_species.taxon,
         log=log,
-        clean_ensembl=False
+        clean_ensembl=False,
+        species_cache=species_cache
     )
 
     if src_gene_data['species'] is None:
@@ -182,18 +187,21 @@ def arbitrary_mapping(
             'gene_list': gene_list,
         }
 
-    if set(current_gene_data['authority']) != set([dst_authority]):
-        current = _convert_authority_in_bulk(
-            db_path=db_path,
-            gene_list=current['gene_list'],
-            src_gene_data=current_gene_data,
-            dst_authority=dst_authority.name,
-            log=log,
-            invalid_mapping_prefix=invalid_mapping_prefix
-        )
+    # always pass through _convert_authority_in_bulk, even if the
+    # genes are already in dst_authority (in which case they are
+    # passed through unchanged); it is also what guarantees that
+    # degenerate genes are masked in the output
+    current = _convert_authority_in_bulk(
+        db_path=db_path,
+        gene_list=current['gene_list'],
+        src_gene_data=current_gene_data,
+        dst_authority=dst_authority.name,
+        log=log,
+        invalid_mapping_prefix=invalid_mapping_prefix
+    )
 
-        for auth_metadata in current['metadata']:
-            metadata.append(auth_metadata)
+    for auth_metadata in current['metadata']:
+        metadata.append(auth_metadata)
 
     # if no genes were successfully map, issue a warning
     successfully_mapped = False
@@ -250,18 +258,24 @@ def _convert_authority_in_bulk(
             f"Unclear how to map to authority '{dst_authority}'; "
             "Must be either 'NCBI' or 'ENSEMBL'"
         )
-    gene_list = np.array(gene_list)
-
-    symbol_idx = np.where(
-        src_gene_data['authority'] == 'symbol'
-    )[0]
-    ensembl_idx = np.where(
-        src_gene_data['authority'] == 'ENSEMBL'
-    )[0]
-    ncbi_idx = np.where(
-        src_gene_data['authority'] == 'NCBI'
-    )[0]
+    # np.asarray avoids copying gene_list if it is already an array
+    gene_list = np.asarray(gene_list)
+
+    # convert the authorities to integer codes in a single pass
+    # (comparing an object array against each authority name
+    # would be a separate Python-level pass per name); the
+    # integer comparisons below are done in C
+    code_lookup = {'symbol': 0, 'ENSEMBL': 1, 'NCBI': 2}
     n_genes = len(gene_list)
+    authority_codes = np.fromiter(
+        (code_lookup.get(authority, -1)
+         for authority in src_gene_data['authority']),
+        dtype=np.int8,
+        count=len(src_gene_data['authority'])
+    )
+    symbol_idx = np.flatnonzero(authority_codes == 0)
+    ensembl_idx = np.flatnonzero(authority_codes == 1)
+    ncbi_idx = np.flatnonzero(authority_codes == 2)
 
     n_found = (
         len(symbol_idx)
@@ -277,7 +291,7 @@ def _convert_authority_in_bulk(
             f"n authorities: {n_found}"
         )
 
-    result = np.array([None]*n_genes)
+    result = np.full(n_genes, None, dtype=object)
 
     metadata = []
     failure_log = None
@@ -305,7 +319,7 @@ def _convert_authority_in_bulk(
             assign_placeholders=True,
             placeholder_prefix=placeholder_prefix
         )
-        result[symbol_idx] = np.array(raw['gene_list'])
+        result[symbol_idx] = np.asarray(raw['gene_list'])
         metadata.append(raw['metadata'])
         failure_log = raw['failure_log']
 
@@ -342,7 +356,7 @@ def _convert_authority_in_bulk(
                 assign_placeholders=True,
                 placeholder_prefix=placeholder_prefix
             )
-            result[idx_arr] = np.array(raw['gene_list'])
+            result[idx_arr] = np.asarray(raw['gene_list'])
             metadata.append(raw['metadata'])
             if failure_log is None:
                 failure_log = raw['failure_log']
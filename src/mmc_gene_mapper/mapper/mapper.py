@@ -1,7 +1,9 @@
 """
 Define the class to actually do gene mapping
 """
+import functools
 import json
+import os
 import pathlib
 import shutil
 import sqlite3
@@ -16,6 +18,7 @@ import mmc_gene_mapper.download.download_manager as download_manager
 import mmc_gene_mapper.mapper.mapper_utils as mapper_utils
 import mmc_gene_mapper.query_db.query as query_utils
 import mmc_gene_mapper.mapper.arbitrary_conversion as arbitrary_conversion
+import mmc_gene_mapper.mapper.species_detection as species_detection
 
 
 class MMCGeneMapper(object):
@@ -28,24 +31,79 @@ class MMCGeneMapper(object):
             raise MalformedMapperDBError(
                 f"db_path {self.db_path} is not a file"
             )
-        try:
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                validity = cursor.execute(
-                    "SELECT validity FROM mmc_gene_mapper_metadata"
-                ).fetchall()
-                if validity != [('TRUE',),]:
-                    raise MalformedMapperDBError(
-                        f"file at {db_path} "
-                        "not marked as valid mmc_gene_mapper "
-                        f"database; validity = {validity}"
-                    )
-        except Exception:
-            err_msg = f"\n{traceback.format_exc()}\n"
-            raise MalformedMapperDBError(
-                f"An error occurred while validating file at {db_path}"
-                f"{err_msg}"
-            )
+        self._conn = None
+        self._conn_pid = None
+
+        # results of the species detection lookups made by
+        # map_genes, kept only as long as this mapper
+        self._species_cache = species_detection.SpeciesLookupCache()
+
+        # the result of the validity check is cached, keyed on
+        # the file's modification time and size, so that
+        # instantiating many mappers for the same database does
+        # not repeat it
+        db_stat = self.db_path.stat()
+        _validate_db(
+            db_path_str=str(self.db_path.resolve()),
+            mtime_ns=db_stat.st_mtime_ns,
+            size=db_stat.st_size
+        )
+
+        self._get_connection()
+
+    def _get_connection(self):
+        """
+        Return the read-only connection shared by all of the
+        methods that query the database, opening it if necessary.
+
+        sqlite3 connections must not be used across a fork, so
+        a process that did not open the connection (e.g. a
+        multiprocessing worker) gets a new one.
+        """
+        if self._conn is None or self._conn_pid != os.getpid():
+            try:
+                conn = _connect_read_only(self.db_path)
+            except Exception:
+                err_msg = f"\n{traceback.format_exc()}\n"
+                raise MalformedMapperDBError(
+                    f"An error occurred while opening file at "
+                    f"{self.db_path}{err_msg}"
+                )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        """
+        Close the connection to the database (and drop any cached
+        species detection results). The connection will be
+        reopened if the mapper is used again.
+        """
+        if getattr(self, '_species_cache', None) is not None:
+            self._species_cache.clear()
+        if getattr(self, '_conn', None) is not None:
+            # only the process that opened the connection closes it
+            if self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._conn_pid = None
+
+    def __del__(self):
+        self.close()
+
+    def __getstate__(self):
+        # sqlite3 connections cannot be pickled; the unpickled
+        # mapper opens its own connection when it is first used
+        # (and starts with an empty species detection cache)
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_conn_pid'] = None
+        state['_species_cache'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._species_cache = species_detection.SpeciesLookupCache()
 
     @classmethod
     def create_mapper(
@@ -55,7 +113,8 @@ class MMCGeneMapper(object):
            data_file_spec=None,
            clobber=False,
            force_download=False,
-           suppress_download_stdout=False):
+           suppress_download_stdout=False,
+           download_mgr=None):
         """
         Parameters
         ----------
@@ -76,22 +135,41 @@ class MMCGeneMapper(object):
         suppress_download_stdout:
             if True, suppress the stdout produced by calling
             wget with subprocess while downloading data
-            (this is necessary when running in a notebook)
+            (this is necessary when running in a notebook).
+            Has no effect if download_mgr is passed in (the
+            DownloadManager's own setting is used).
+        download_mgr:
+            optional DownloadManager to use when fetching data.
+            Passing the same DownloadManager to several calls
+            (e.g. when building multiple databases) lets them
+            share one download directory. If None, a new
+            DownloadManager is created in a temporary directory
+            under local_dir.
         """
 
-        dst_dir = pathlib.Path(
-            tempfile.mkdtemp(
-                dir=local_dir,
-                prefix=(
-                    f'mmc_gene_mapper_downloads_{timestamp.get_timestamp()}_'
+        # a download directory is only needed if we are creating
+        # our own DownloadManager
+        if download_mgr is None:
+            dst_dir = pathlib.Path(
+                tempfile.mkdtemp(
+                    dir=local_dir,
+                    prefix=(
+                        'mmc_gene_mapper_downloads_'
+                        f'{timestamp.get_timestamp()}_'
+                    )
                 )
             )
-        )
+            scratch_parent = dst_dir
+            scratch_prefix = 'scratch_'
+        else:
+            dst_dir = None
+            scratch_parent = local_dir
+            scratch_prefix = 'mmc_gene_mapper_scratch_'
 
         tmp_dir = pathlib.Path(
             tempfile.mkdtemp(
-                dir=dst_dir,
-                prefix='scratch_'
+                dir=scratch_parent,
+                prefix=scratch_prefix
             )
         )
         try:
@@ -102,15 +180,17 @@ class MMCGeneMapper(object):
                 data_file_spec=data_file_spec,
                 clobber=clobber,
                 force_download=force_download,
-                suppress_download_stdout=suppress_download_stdout
+                suppress_download_stdout=suppress_download_stdout,
+                download_mgr=download_mgr
             )
         finally:
 
             file_utils.clean_up(tmp_dir)
 
-            contents = [n for n in dst_dir.iterdir()]
-            if len(contents) == 0:
-                file_utils.clean_up(dst_dir)
+            if dst_dir is not None:
+                contents = [n for n in dst_dir.iterdir()]
+                if len(contents) == 0:
+                    file_utils.clean_up(dst_dir)
 
         return cls(db_path=db_path)
 
@@ -123,17 +203,20 @@ class MMCGeneMapper(object):
         which the database can translate into a numerial value
         for cross referencing against the gene tables.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            gene_names = cursor.execute(
-                """
-                SELECT
-                    DISTINCT(name)
-                FROM
-                    NCBI_species
-                """
-            ).fetchall()
-        result = sorted([str(row[0]) for row in gene_names])
+        cursor = self._get_connection().cursor()
+        gene_names = cursor.execute(
+            """
+            SELECT
+                DISTINCT(name)
+            FROM
+                NCBI_species
+            ORDER BY
+                name
+            """
+        )
+        # NCBI_species_idx means SQLite can return the names
+        # in sorted order by walking the index
+        result = [str(row[0]) for row in gene_names]
         return result
 
     def get_all_citations(self):
@@ -147,17 +230,16 @@ class MMCGeneMapper(object):
             }
         """
 
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            raw = cursor.execute(
-                """
-                SELECT
-                    name,
-                    metadata
-                FROM
-                    citation
-                """
-            ).fetchall()
+        cursor = self._get_connection().cursor()
+        raw = cursor.execute(
+            """
+            SELECT
+                name,
+                metadata
+            FROM
+                citation
+            """
+        )
 
         return [
             {"name": row[0],
@@ -170,16 +252,15 @@ class MMCGeneMapper(object):
         Return a list of strings representing the names of all
         the authorities in this database
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            raw = cursor.execute(
-                """
-                SELECT
-                    name
-                FROM
-                    authority
-                """
-            ).fetchall()
+        cursor = self._get_connection().cursor()
+        raw = cursor.execute(
+            """
+            SELECT
+                name
+            FROM
+                authority
+            """
+        )
 
         return [
             row[0] for row in raw
@@ -215,12 +296,10 @@ class MMCGeneMapper(object):
             an optional string. If not None, this will be prepended
             to the placeholder names of all unmappable genes
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            dst_species = query_utils.get_species(
-                cursor=cursor,
-                species=dst_species
-            )
+        dst_species = query_utils.get_species(
+            cursor=self._get_connection().cursor(),
+            species=dst_species
+        )
 
         return arbitrary_conversion.arbitrary_mapping(
             db_path=self.db_path,
@@ -229,7 +308,8 @@ class MMCGeneMapper(object):
             dst_authority=metadata_classes.Authority(dst_authority),
             ortholog_citation=ortholog_citation,
             log=log,
-            invalid_mapping_prefix=invalid_mapping_prefix
+            invalid_mapping_prefix=invalid_mapping_prefix,
+            species_cache=self._species_cache
         )
 
 
@@ -240,12 +320,14 @@ def _initialize_mapper(
         data_file_spec,
         clobber,
         force_download,
-        suppress_download_stdout):
+        suppress_download_stdout,
+        download_mgr=None):
 
-    download_mgr = download_manager.DownloadManager(
-        dst_dir=dst_dir,
-        suppress_stdout=suppress_download_stdout
-    )
+    if download_mgr is None:
+        download_mgr = download_manager.DownloadManager(
+            dst_dir=dst_dir,
+            suppress_stdout=suppress_download_stdout
+        )
 
     db_path = pathlib.Path(db_path)
     if db_path.exists():
@@ -274,11 +356,15 @@ def _initialize_mapper(
         download_manager=download_mgr,
         data_file_spec=data_file_spec,
         tmp_dir=tmp_dir,
-        force_download=force_download
+        force_download=force_download,
+        unsafe_fast_writes=True
     )
 
+    # tmp_db_path is only moved into place once it is complete,
+    # so there is no need for sqlite3 to fsync while building it
     mapper_utils.create_bibliography_table(
-       tmp_db_path
+       tmp_db_path,
+       unsafe_fast_writes=True
     )
 
     pre_metadata_hash = file_utils.hash_from_path(
@@ -317,5 +403,67 @@ def _initialize_mapper(
     print(f'=======DB CREATION TOOK {dur:.2e} MINUTES=======')
 
 
+@functools.lru_cache(maxsize=16)
+def _validate_db(db_path_str, mtime_ns, size):
+    """
+    Check that the file at db_path_str is a valid mmc_gene_mapper
+    database. Raise a MalformedMapperDBError if not.
+
+    mtime_ns and size are only used to key the cache, so that a
+    file that has been modified is checked again. Failures are
+    not cached.
+    """
+    try:
+        conn = _connect_read_only(db_path_str)
+    except Exception:
+        err_msg = f"\n{traceback.format_exc()}\n"
+        raise MalformedMapperDBError(
+            f"An error occurred while opening file at {db_path_str}"
+            f"{err_msg}"
+        )
+
+    try:
+        cursor = conn.cursor()
+        validity = cursor.execute(
+            "SELECT validity FROM mmc_gene_mapper_metadata"
+        ).fetchall()
+        if validity != [('TRUE',),]:
+            raise MalformedMapperDBError(
+                f"file at {db_path_str} "
+                "not marked as valid mmc_gene_mapper "
+                f"database; validity = {validity}"
+            )
+    except Exception:
+        err_msg = f"\n{traceback.format_exc()}\n"
+        raise MalformedMapperDBError(
+            f"An error occurred while validating file at {db_path_str}"
+            f"{err_msg}"
+        )
+    finally:
+        conn.close()
+
+    return True
+
+
+def _connect_read_only(db_path):
+    """
+    Return a read-only sqlite3 connection to the database
+    at db_path, tuned for repeated lookups.
+    """
+    db_path = pathlib.Path(db_path).resolve()
+    conn = sqlite3.connect(
+        f"{db_path.as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        cached_statements=256,
+        # the connection only ever reads, so there is no need
+        # for sqlite3 to open transactions implicitly
+        isolation_level=None
+    )
+    query_utils.tune_read_connection(conn)
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+
 class MalformedMapperDBError(Exception):
     pass
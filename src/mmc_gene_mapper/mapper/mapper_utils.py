@@ -2,7 +2,6 @@
 utility functions for gene mapper class
 """
 
-import copy
 import numpy as np
 import re
 import sqlite3
@@ -16,14 +15,47 @@ import mmc_gene_mapper.create_db.bkbit_ingestion as bkbit_ingestion
 import mmc_gene_mapper.create_db.ortholog_ingestion as ortholog_ingestion
 
 
+# tag marking genes that have been given placeholder names
+# because they are degenerate, and the pattern used to find
+# the index of pre-existing degenerate placeholders
+_DEGENERATE_TAG = 'UNMAPPABLE_DEGENERATE'
+_DEGENERATE_OFFSET_PATTERN = re.compile(f'({_DEGENERATE_TAG}_)([0-9]+)')
+
+
 def create_mapper_database(
         db_path,
         download_manager,
         tmp_dir,
         force_download,
-        data_file_spec=None):
+        data_file_spec=None,
+        unsafe_fast_writes=False):
+    """
+    Create the tables in the database at db_path and ingest
+    all of the data into them.
+
+    If unsafe_fast_writes is True, sqlite3 does not fsync after
+    every transaction while the database is being built (see
+    create_db.utils.tune_build_connection). Only pass True if
+    db_path is a temporary file that will be discarded should
+    this fail.
+    """
+
+    if data_file_spec is None:
+        data_file_spec = []
+
+    # check the file types before doing any (expensive) ingestion
+    for file_spec in data_file_spec:
+        if file_spec['type'] not in ('bkbit', 'hmba_orthologs'):
+            raise RuntimeError(
+                f"cannot parse file of type {file_spec['type']}"
+            )
 
     with sqlite3.connect(db_path) as conn:
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
+        conn.execute("BEGIN")
         data_utils.create_data_tables(conn)
         metadata_utils.create_metadata_tables(conn)
 
@@ -31,61 +63,89 @@ def create_mapper_database(
         db_path=db_path,
         download_manager=download_manager,
         clobber=False,
-        force_download=force_download
+        force_download=force_download,
+        unsafe_fast_writes=unsafe_fast_writes
     )
 
     species_ingestion.ingest_species_data(
         db_path=db_path,
         download_manager=download_manager,
         tmp_dir=tmp_dir,
-        force_download=force_download
+        force_download=force_download,
+        unsafe_fast_writes=unsafe_fast_writes
+    )
+
+    # bkbit genes must be ingested before any orthologs that
+    # refer to them (sorted() is stable, so the order of files
+    # within each type is preserved)
+    data_file_spec = sorted(
+        data_file_spec,
+        key=lambda file_spec: 0 if file_spec['type'] == 'bkbit' else 1
+    )
+    n_bkbit = sum(
+        [file_spec['type'] == 'bkbit' for file_spec in data_file_spec]
     )
 
     print("=====TIME TO INGEST FILES FROM ENSEMBL======")
-    if data_file_spec is not None:
-        n_files = len(data_file_spec)
-        for ct, file_spec in enumerate(data_file_spec):
-            if file_spec['type'] == 'bkbit':
-                bkbit_ingestion.ingest_bkbit_genes(
-                    db_path=db_path,
-                    bkbit_path=file_spec['path']
-                )
-            if ct % max(1, (n_files//10)) == 0:
-                print(f'    INGESTED {ct} of {n_files}')
-    print("=======DONE INGESTING FILES FROM ENSEMBL=======")
-
-    if data_file_spec is not None:
-        for file_spec in data_file_spec:
-            if file_spec['type'] == 'bkbit':
-                continue
-            elif file_spec['type'] == 'hmba_orthologs':
-                ortholog_ingestion.ingest_hmba_orthologs(
-                    db_path=db_path,
-                    hmba_file_path=file_spec['path'],
-                    citation_name=file_spec['name'],
-                    clobber=False
-                )
-            else:
-                raise RuntimeError(
-                    f"cannot parse file of type {file_spec['type']}"
-                )
+    for ct, file_spec in enumerate(data_file_spec):
+        if file_spec['type'] == 'bkbit':
+            bkbit_ingestion.ingest_bkbit_genes(
+                db_path=db_path,
+                bkbit_path=file_spec['path'],
+                unsafe_fast_writes=unsafe_fast_writes
+            )
+            if ct % max(1, (n_bkbit//10)) == 0:
+                print(f'    INGESTED {ct} of {n_bkbit}')
+        else:
+            ortholog_ingestion.ingest_hmba_orthologs(
+                db_path=db_path,
+                hmba_file_path=file_spec['path'],
+                citation_name=file_spec['name'],
+                clobber=False,
+                unsafe_fast_writes=unsafe_fast_writes
+            )
+    print("=======DONE INGESTING DATA FILES=======")
 
     # only after all data has been ingested
     with sqlite3.connect(db_path) as conn:
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
+        conn.execute("BEGIN")
         data_utils.create_data_indexes(conn)
 
+        # gather statistics on the new indexes so that the query
+        # planner can choose between them
+        conn.execute("ANALYZE")
+
 
 def create_bibliography_table(
-        db_path):
+        db_path,
+        unsafe_fast_writes=False):
     """
     Create species_bibliography which lists all
     combinations of authority, citation, species in the
     gene table.
+
+    unsafe_fast_writes is passed to
+    create_db.utils.tune_build_connection (only pass True if
+    db_path is a temporary file).
     """
     print("=======CREATING BIBLIOGRAPHY TABLE=======")
     table_name = "species_bibliography"
     index_name = "species_bibliography_idx"
     with sqlite3.connect(db_path) as conn:
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
+
+        # run the whole rebuild as one explicit transaction
+        # (sqlite3 does not implicitly open transactions around
+        # DROP/CREATE statements); it is committed when the
+        # connection context manager exits
+        conn.execute("BEGIN")
         cursor = conn.cursor()
         db_utils.delete_index(
             cursor=cursor,
@@ -106,60 +166,35 @@ def create_bibliography_table(
             )
             """
         )
-        raw = cursor.execute(
-            """
-            SELECT
-                authority,
-                citation,
-                species_taxon
-            FROM gene
-            GROUP BY
+        # COUNT(symbol) skips NULLs, so a single pass over the
+        # gene table yields both the (authority, citation, species)
+        # combinations and whether or not they have symbols.
+        # Running it as INSERT ... SELECT keeps the rows inside
+        # SQLite rather than passing them through Python.
+        #
+        # The grouping matches gene_symbol_idx (citation, authority,
+        # species_taxon, symbol), which is created at the end of
+        # create_mapper_database, so this is an index-only scan
+        # that needs no temporary B-tree to do the grouping.
+        cursor.execute(
+            f"""
+            INSERT INTO {table_name} (
                 authority,
                 citation,
-                species_taxon
-            """
-        ).fetchall()
-
-        has_symbols = cursor.execute(
-            """
+                species_taxon,
+                has_symbols
+            )
             SELECT
                 authority,
                 citation,
                 species_taxon,
-                COUNT(symbol)
+                CASE WHEN COUNT(symbol) > 0 THEN 1 ELSE 0 END
             FROM gene
-            WHERE
-                symbol IS NOT NULL
             GROUP BY
-                authority,
                 citation,
+                authority,
                 species_taxon
             """
-        ).fetchall()
-
-        has_symbols = {
-            row[:-1]: row[-1]
-            for row in has_symbols
-        }
-
-        values = [
-            (*row, 1)
-            if row in has_symbols and has_symbols[row] > 0
-            else (*row, 0)
-            for row in raw
-        ]
-
-        cursor.executemany(
-            f"""
-            INSERT INTO {table_name} (
-                authority,
-                citation,
-                species_taxon,
-                has_symbols
-            )
-            VALUES (?, ?, ?, ?)
-            """,
-            values
         )
         db_utils.create_index(
             cursor=cursor,
@@ -167,6 +202,7 @@ def create_bibliography_table(
             table_name=table_name,
             column_tuple=("species_taxon", "authority", "has_symbols")
         )
+        cursor.execute(f"ANALYZE {table_name}")
 
 
 def apply_mapping(
@@ -209,41 +245,82 @@ def apply_mapping(
     Genes that are degenerate (i.e. that map to the same
     identifier) will also be marked as unmappable
     """
+    # look each gene up in mapping exactly once
+    n_genes = len(gene_list)
+    gene_matches = [mapping.get(gene, ()) for gene in gene_list]
+
+    # fast path: every gene has exactly one match and no two genes
+    # share a match, so there are no placeholders to assign
+    # (all() stops at the first gene that does not map 1:1)
+    if all(len(matches) == 1 for matches in gene_matches):
+        new_gene_list = [matches[0] for matches in gene_matches]
+        if len(set(new_gene_list)) == len(new_gene_list):
+            return {
+                'failure_log': {
+                    'zero matches': 0,
+                    'many matches': 0,
+                    'degenerate matches': 0
+                },
+                'gene_list': new_gene_list
+            }
+
+    if placeholder_prefix is None:
+        no_match_label = 'UNMAPPABLE_NO_MATCH_'
+        many_matches_label = 'UNMAPPABLE_MANY_MATCHES_'
+    else:
+        no_match_label = f'{placeholder_prefix}:UNMAPPABLE_NO_MATCH_'
+        many_matches_label = (
+            f'{placeholder_prefix}:UNMAPPABLE_MANY_MATCHES_'
+        )
+
+    # count the matches for each gene so that the genes can be
+    # sorted into categories with boolean masks
+    n_matches = np.fromiter(
+        (len(matches) for matches in gene_matches),
+        dtype=int,
+        count=n_genes
+    )
+    is_ok = (n_matches == 1)
+    is_zero = (n_matches == 0)
+    is_many = (n_matches > 1)
+
     failure_log = {
-        'zero matches': 0,
-        'many matches': 0
+        'zero matches': int(is_zero.sum()),
+        'many matches': int(is_many.sum())
     }
 
-    new_gene_list = []
-    for gene in gene_list:
-        this = mapping.get(gene, [])
-        if len(this) == 1:
-            assn = this[0]
-        else:
-            if len(this) == 0:
-                ct = failure_log['zero matches']
-                if assign_placeholders and 'UNMAPPABLE' not in gene:
-                    if placeholder_prefix is None:
-                        assn = f'UNMAPPABLE_NO_MATCH_{ct}'
-                    else:
-                        assn = f'{placeholder_prefix}:UNMAPPABLE_NO_MATCH_{ct}'
-                else:
-                    assn = gene
-                failure_log['zero matches'] += 1
-            else:
-                ct = failure_log['many matches']
-                if assign_placeholders and 'UNMAPPABLE' not in gene:
-                    if placeholder_prefix is None:
-                        assn = f'UNMAPPABLE_MANY_MATCHES_{ct}'
-                    else:
-                        assn = (
-                            f'{placeholder_prefix}:UNMAPPABLE_MANY_MATCHES'
-                            f'_{ct}'
-                        )
-                else:
-                    assn = gene
-                failure_log['many matches'] += 1
-        new_gene_list.append(assn)
+    # by default, genes keep their original names
+    new_gene_list = np.array(gene_list, dtype=object)
+
+    ok_idx = np.where(is_ok)[0]
+    new_gene_list[ok_idx] = [
+        gene_matches[ii][0] for ii in ok_idx
+    ]
+
+    if assign_placeholders:
+        # genes that were already marked as unmappable (possibly with
+        # a prefix from an earlier stage of mapping, hence the
+        # substring check rather than startswith) keep their names
+        already_unmappable = np.fromiter(
+            ('UNMAPPABLE' in gene for gene in gene_list),
+            dtype=bool,
+            count=n_genes
+        )
+
+        # the placeholder counters number the failed genes in
+        # order, including those that keep their names
+        for mask, label in ((is_zero, no_match_label),
+                            (is_many, many_matches_label)):
+            counter = np.cumsum(mask) - 1
+            idx = np.where(mask & ~already_unmappable)[0]
+            if len(idx) == 0:
+                continue
+            new_gene_list[idx] = np.char.add(
+                label,
+                counter[idx].astype(str)
+            ).tolist()
+
+    new_gene_list = new_gene_list.tolist()
 
     (new_gene_list,
      n_degen) = mask_degenerate_genes(
@@ -285,51 +362,65 @@ def mask_degenerate_genes(
     Number of degenerate genes found.
     """
 
-    tag = 'UNMAPPABLE_DEGENERATE'
+    # the common case: no degenerate genes. Checking this with a set
+    # is a single hashing pass, rather than the sort in np.unique.
+    # The genes are immutable strings, so a shallow copy suffices
+    if len(set(gene_list)) == len(gene_list):
+        return list(gene_list), 0
+
+    tag = _DEGENERATE_TAG
 
     # find offset for degenerate cell labels
     offset = 0
-    offset_pattern = re.compile(
-        f'({tag}_)([0-9]+)'
-    )
     for label in gene_list:
-        mtch = offset_pattern.search(label)
+        # a plain substring check is much cheaper than the regex
+        # and rules out almost every label
+        if tag not in label:
+            continue
+        mtch = _DEGENERATE_OFFSET_PATTERN.search(label)
         if mtch is not None:
             this = int(mtch.group(2))
             if this >= offset:
                 offset = this+1
 
     # make sure genes have unique names
-    salt = 0
-    unq, ct = np.unique(gene_list, return_counts=True)
+    unq, unq_idx, ct = np.unique(
+        np.asarray(gene_list, dtype=object),
+        return_inverse=True,
+        return_counts=True
+    )
     degen = (ct > 1)
-    unq = unq[degen]
-    degen_gene_to_idx = {
-        u: ii for ii, u in enumerate(unq)
-    }
-    degen_gene_to_ct = {
-        g: 0 for g in degen_gene_to_idx
-    }
-    n_degen = 0
-    if len(degen_gene_to_idx) > 0:
-        new_gene_list = []
-        n_degen = len(degen_gene_to_idx)*2
-        for ii in range(len(gene_list)):
-            gene = gene_list[ii]
-            if gene in degen_gene_to_idx:
-                pair = degen_gene_to_idx[gene]
-                salt = degen_gene_to_ct[gene]
-                if placeholder_prefix is None:
-                    assn = f'{tag}_{pair+offset}_{salt}'
-                else:
-                    assn = (
-                        f'{placeholder_prefix}:'
-                        f'{tag}_{pair+offset}_{salt}'
-                    )
-                new_gene_list.append(assn)
-                degen_gene_to_ct[gene] += 1
-            else:
-                new_gene_list.append(gene)
+    n_degen = int(degen.sum())*2
+
+    # pair[ii] is the rank of gene_list[ii] among the sorted
+    # degenerate genes (-1 if gene_list[ii] is not degenerate)
+    pair_lookup = np.full(len(unq), -1, dtype=int)
+    pair_lookup[degen] = np.arange(degen.sum())
+    pair = pair_lookup[unq_idx]
+    degen_idx = np.where(pair >= 0)[0]
+    pair = pair[degen_idx]
+
+    # salt is the number of times the same degenerate gene
+    # has already occurred in gene_list
+    sorted_idx = np.argsort(pair, kind='stable')
+    sorted_pair = pair[sorted_idx]
+    salt = np.empty(len(pair), dtype=int)
+    salt[sorted_idx] = (
+        np.arange(len(pair))
+        - np.searchsorted(sorted_pair, sorted_pair, side='left')
+    )
+
+    if placeholder_prefix is None:
+        label_prefix = f'{tag}_'
     else:
-        new_gene_list = copy.deepcopy(gene_list)
+        label_prefix = f'{placeholder_prefix}:{tag}_'
+
+    labels = np.char.add(
+        np.char.add(label_prefix, (pair+offset).astype(str)),
+        np.char.add('_', salt.astype(str))
+    )
+
+    new_gene_list = np.array(gene_list, dtype=object)
+    new_gene_list[degen_idx] = labels.tolist()
+    new_gene_list = new_gene_list.tolist()
     return new_gene_list, n_degen
@@ -7,6 +7,12 @@ import mmc_gene_mapper.mapper.mapper_utils as mapper_utils
 import mmc_gene_mapper.query_db.query as query_utils
 
 
+# number of values per query used by the functions in this module
+# when the values have to be bound as individual parameters (i.e.
+# when SQLite's json_each is not available)
+_QUERY_CHUNK_SIZE = 500
+
+
 def identifiers_from_symbols(
         db_path,
         gene_symbol_list,
@@ -68,20 +74,13 @@ def identifiers_from_symbols(
         authority_name=authority_name
     )
 
-    mapped_result = mapper_utils.apply_mapping(
+    return _apply_and_wrap(
         gene_list=gene_symbol_list,
-        mapping=mapping['mapping'],
+        mapping=mapping,
         assign_placeholders=assign_placeholders,
         placeholder_prefix=placeholder_prefix
     )
 
-    result = {
-        "metadata": mapping["metadata"],
-        "failure_log": mapped_result["failure_log"],
-        "gene_list": mapped_result["gene_list"]
-    }
-    return result
-
 
 def identifiers_from_symbols_mapping(
         db_path,
@@ -135,7 +134,7 @@ def identifiers_from_symbols_mapping(
         src_list=gene_symbol_list,
         authority_name=authority_name,
         species=species,
-        chunk_size=500
+        chunk_size=_QUERY_CHUNK_SIZE
     )
     return result
 
@@ -205,21 +204,13 @@ def equivalent_genes(
         citation_name=citation_name
     )
 
-    mapped_result = mapper_utils.apply_mapping(
+    return _apply_and_wrap(
         gene_list=gene_list,
-        mapping=mapping['mapping'],
+        mapping=mapping,
         assign_placeholders=assign_placeholders,
         placeholder_prefix=placeholder_prefix
     )
 
-    result = {
-        'metadata': mapping['metadata'],
-        'failure_log': mapped_result['failure_log'],
-        'gene_list': mapped_result['gene_list']
-    }
-
-    return result
-
 
 def ortholog_genes_mapping(
         db_path,
@@ -281,7 +272,7 @@ def ortholog_genes_mapping(
         dst_species=dst_species,
         src_gene_list=gene_list,
         citation_name=citation_name,
-        chunk_size=500
+        chunk_size=_QUERY_CHUNK_SIZE
     )
 
 
@@ -348,19 +339,13 @@ def ortholog_genes(
         citation_name=citation_name
     )
 
-    mapped_result = mapper_utils.apply_mapping(
+    return _apply_and_wrap(
         gene_list=gene_list,
-        mapping=mapping['mapping'],
+        mapping=mapping,
         assign_placeholders=assign_placeholders,
         placeholder_prefix=placeholder_prefix
     )
 
-    return {
-        'metadata': mapping['metadata'],
-        'failure_log': mapped_result['failure_log'],
-        'gene_list': mapped_result['gene_list']
-    }
-
 
 def equivalent_genes_mapping(
         db_path,
@@ -416,5 +401,57 @@ def equivalent_genes_mapping(
         input_gene_list=gene_list,
         species=species,
         citation_name=citation_name,
-        chunk_size=500
+        chunk_size=_QUERY_CHUNK_SIZE
+    )
+
+
+def _apply_and_wrap(
+        gene_list,
+        mapping,
+        assign_placeholders,
+        placeholder_prefix):
+    """
+    Apply a mapping (as returned by one of the *_mapping functions
+    in this module) to gene_list and assemble the result returned
+    by identifiers_from_symbols, equivalent_genes and ortholog_genes.
+
+    Parameters
+    ----------
+    gene_list:
+        list of genes to be mapped
+    mapping:
+        a dict with keys "metadata" and "mapping" (the latter
+        mapping each gene to the list of its matches)
+    assign_placeholders:
+        a boolean. If True, assign placeholder names
+        to any genes that cannot be mapped
+    placeholder_prefix:
+        optional prefix to apply to the placeholer names
+        given to unmappable genes.
+
+    Returns
+    -------
+    A dict
+        {
+          "metadata": mapping["metadata"],
+          "failure_log": {
+             summary of how many genes failed to be mapped
+             for what reasons
+          }
+          "gene_list": [
+              list of mapped gene identifiers
+          ]
+        }
+    """
+    mapped_result = mapper_utils.apply_mapping(
+        gene_list=gene_list,
+        mapping=mapping['mapping'],
+        assign_placeholders=assign_placeholders,
+        placeholder_prefix=placeholder_prefix
     )
+
+    return {
+        'metadata': mapping['metadata'],
+        'failure_log': mapped_result['failure_log'],
+        'gene_list': mapped_result['gene_list']
+    }
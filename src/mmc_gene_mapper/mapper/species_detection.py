@@ -1,19 +1,40 @@
+import collections
+import concurrent.futures
+import functools
 import numpy as np
 import pathlib
 import sqlite3
+import sys
+import threading
+import types
 
+import mmc_gene_mapper.metadata.classes as metadata_classes
 import mmc_gene_mapper.utils.log_class as log_class
 import mmc_gene_mapper.utils.str_utils as str_utils
 import mmc_gene_mapper.query_db.query as query_utils
 
 
+# chunks with fewer genes than this are queried with
+# an 'IN (?, ?, ...)' clause rather than by populating
+# the temporary gene_input table
+_MIN_JOIN_CHUNK_SIZE = 100
+
+# if True, chunks of no more than _MAX_OR_CHAIN_SIZE genes are
+# queried with 'col = ? OR col = ? ...' rather than 'col IN (...)'.
+# With SQLite 3.40 both forms produce the same index search, so
+# this is off by default.
+_FAVOR_OR_CHAINS = False
+_MAX_OR_CHAIN_SIZE = 32
+
+
 def detect_species_and_authority(
         db_path,
         gene_list,
-        chunk_size=1000,
+        chunk_size=None,
         guess_taxon=None,
         log=None,
-        clean_ensembl=True):
+        clean_ensembl=True,
+        species_cache=None):
     """
     Find the species and authority for a list of gene
     identifiers. Genes can be from an inhomogeneous list of
@@ -27,7 +48,8 @@ def detect_species_and_authority(
         list of gene identifiers we are trying to map.
     chunk_size:
         an int; the number of genes to match to a species/authority
-        at once
+        at once. If None, all of the genes are written to a
+        temporary table and matched with a single query.
     guess_taxon:
        an optional int. This only comes into play if we end up
        having to choose a species based on gene symbols. If this
@@ -40,6 +62,9 @@ def detect_species_and_authority(
     clean_ensembl:
         if True, loop over gene_list to remove version suffixes
         from ENSEMBL IDs
+    species_cache:
+        an optional SpeciesLookupCache. If not None, the
+        identifier and symbol lookups are cached in it.
 
     Returns
     --------
@@ -72,122 +97,133 @@ def detect_species_and_authority(
     if clean_ensembl:
         gene_list = str_utils.remove_ensembl_versions(gene_list)
 
-    gene_list = np.array(gene_list)
+    # keep gene_list as a plain list of str so that the genes
+    # are bound to SQL parameters without numpy scalar boxing
+    gene_list = list(gene_list)
     n_genes = len(gene_list)
 
-    from_identifier = species_from_identifier(
-        db_path=db_path,
-        gene_list=gene_list,
-        log=log
-    )
+    # every gene is also looked up as a symbol, even if it was
+    # found as an identifier: a string can be an identifier in one
+    # species and a symbol in another, and both matches vote.
+    #
+    # The two lookups are independent and each uses its own
+    # connection, so they are run concurrently (sqlite3 releases
+    # the GIL while a query runs)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        identifier_future = executor.submit(
+            _species_from_column,
+            db_path=db_path,
+            gene_list=gene_list,
+            col_name="identifier",
+            chunk_size=chunk_size,
+            log=log,
+            read_only=True,
+            cache=species_cache
+        )
+        symbol_future = executor.submit(
+            _species_from_column,
+            db_path=db_path,
+            gene_list=gene_list,
+            col_name="symbol",
+            chunk_size=chunk_size,
+            log=log,
+            read_only=True,
+            cache=species_cache
+        )
+        from_identifier = identifier_future.result()
+        from_symbol = symbol_future.result()
 
-    from_symbol = species_from_symbol(
-        db_path=db_path,
+    (votes,
+     cts) = _tally_species_votes(
         gene_list=gene_list,
-        log=log
+        from_identifier=from_identifier,
+        from_symbol=from_symbol
     )
 
-    votes = []
-
-    for gene in gene_list:
-        these_votes = []
-        if gene in from_identifier:
-            these_votes += [
-                val['species_taxon']
-                for val in from_identifier[gene]
-            ]
-        if gene in from_symbol:
-            these_votes += [
-                val['species_taxon']
-                for val in from_symbol[gene]
-            ]
-        if len(these_votes) == 0:
-            continue
-        these_votes, these_cts = np.unique(these_votes, return_counts=True)
-        max_ct = these_cts.max()
-        valid = np.where(these_cts == max_ct)
-        votes.append(these_votes[valid])
-
     if len(votes) == 0:
         chosen_species = None
     else:
-        votes = np.concatenate(votes)
-        votes, cts = np.unique(votes, return_counts=True)
         chosen_cts = cts.max()
         chosen_dex = np.where(cts == chosen_cts)
         chosen_taxon = votes[chosen_dex]
 
         chosen_species = None
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            species_lookup = {
-                ii: query_utils.get_species(
-                    cursor=cursor,
-                    species=int(ii)
-                )
-                for ii in chosen_taxon
-            }
-
-            if len(chosen_taxon) > 1:
-
-                # try to break the species degeneracy with the
-                # guess_taxon
-                broke_degeneracy = False
-                msg = (
-                    f"{chosen_cts} of your genes were consistent with "
-                    "the following species:\n"
-                )
-                for val in species_lookup.values():
-                    msg += f"'{val}'\n"
-
-                if guess_taxon is not None:
-                    if guess_taxon in chosen_taxon:
-                        broke_degeneracy = True
-                        chosen_species = species_lookup[guess_taxon]
-                        msg += (
-                            "using guess to resolve degeneracy "
-                            "in favor of '{speces_lookup[guess_taxon]}'"
-                        )
-                        log.warn(msg)
 
-                if not broke_degeneracy:
-                    msg += "Unable to break this degeneracy"
-                    raise InconsistentSpeciesError(msg)
-
-            if chosen_species is None:
-                chosen_species = query_utils.get_species(
-                    cursor=cursor,
-                    species=int(chosen_taxon[0])
-                )
+        # species names are looked up through a cache keyed on the
+        # database file, so that repeated calls against the same
+        # database do not have to connect to it again
+        db_path = pathlib.Path(db_path)
+        db_stat = db_path.stat()
+        species_lookup = dict()
+        for taxon in chosen_taxon:
+            taxon = int(taxon)
+            species_lookup[taxon] = metadata_classes.Species(
+                name=_get_species_name_cached(
+                    db_path_str=str(db_path.resolve()),
+                    mtime_ns=db_stat.st_mtime_ns,
+                    size=db_stat.st_size,
+                    species_taxon=taxon
+                ),
+                taxon=taxon
+            )
+
+        if len(chosen_taxon) > 1:
+
+            # try to break the species degeneracy with the
+            # guess_taxon
+            broke_degeneracy = False
+            msg = (
+                f"{chosen_cts} of your genes were consistent with "
+                "the following species:\n"
+            )
+            for val in species_lookup.values():
+                msg += f"'{val}'\n"
+
+            if guess_taxon is not None:
+                if guess_taxon in chosen_taxon:
+                    broke_degeneracy = True
+                    chosen_species = species_lookup[guess_taxon]
+                    msg += (
+                        "using guess to resolve degeneracy "
+                        f"in favor of '{species_lookup[guess_taxon]}'"
+                    )
+                    log.warn(msg)
+
+            if not broke_degeneracy:
+                msg += "Unable to break this degeneracy"
+                raise InconsistentSpeciesError(msg)
+
+        if chosen_species is None:
+            chosen_species = species_lookup[chosen_taxon[0]]
 
         log.info(
             f"Based on {chosen_cts} genes, your input data is from species "
             f"'{chosen_species}'"
         )
 
-    # assign authorities to the genes
-    authority = np.array([None]*n_genes)
+    # assign authorities to the genes.
+    # Authorities are recorded as small integer codes indexing
+    # authority_names. Code 0 is 'symbol'; any gene that is not
+    # matched to an identifier in the chosen species is assumed
+    # to be a symbol.
+    authority_names = ['symbol']
+    authority_to_code = {'symbol': 0}
+    authority_codes = np.zeros(n_genes, dtype=np.int8)
 
     if chosen_species is not None:
         for i_gene, gene in enumerate(gene_list):
-            assigned = False
-            if gene in from_identifier:
-                for val in from_identifier[gene]:
-                    if val['species_taxon'] == chosen_species.taxon:
-                        authority[i_gene] = val['authority']
-                        assigned = True
-                        break
-            if not assigned:
-                if gene in from_symbol:
-                    authority[i_gene] = 'symbol'
-
-    # any authorities that are still unknown will be assumed to be
-    # symbols
-    unknown_idx = np.array(
-        [ii for ii in range(n_genes) if authority[ii] is None]
-    )
-    if len(unknown_idx) > 0:
-        authority[unknown_idx] = 'symbol'
+            if gene not in from_identifier:
+                continue
+            for val in from_identifier[gene]:
+                if val['species_taxon'] == chosen_species.taxon:
+                    name = val['authority']
+                    if name not in authority_to_code:
+                        authority_to_code[name] = len(authority_names)
+                        authority_names.append(name)
+                    authority_codes[i_gene] = authority_to_code[name]
+                    break
+
+    authority = np.array(authority_names, dtype=object)[authority_codes]
 
     return {
         "authority": authority,
@@ -195,39 +231,167 @@ def detect_species_and_authority(
     }
 
 
+def _tally_species_votes(
+        gene_list,
+        from_identifier,
+        from_symbol):
+    """
+    Each gene in gene_list votes for the species taxon (or taxons,
+    in case of a tie) that it matches most often in from_identifier
+    and from_symbol. Tally those votes.
+
+    Parameters
+    ----------
+    gene_list:
+        list of genes (a gene that occurs more than once
+        votes once for each occurrence)
+    from_identifier:
+        the result of species_from_identifier for gene_list
+    from_symbol:
+        the result of species_from_symbol for gene_list
+
+    Returns
+    -------
+    votes:
+        np.array of the distinct taxons voted for (sorted)
+    cts:
+        np.array of how many genes voted for each taxon
+    """
+    # how many times each distinct gene occurs in gene_list
+    gene_multiplicity = dict()
+    for gene in gene_list:
+        gene_multiplicity[gene] = gene_multiplicity.get(gene, 0) + 1
+
+    # flatten all of the matches into (gene, taxon) arrays
+    gene_idx = []
+    taxon = []
+    multiplicity = []
+    for gene, n_occurrences in gene_multiplicity.items():
+        n_matches = 0
+        for lookup in (from_identifier, from_symbol):
+            if gene in lookup:
+                for val in lookup[gene]:
+                    taxon.append(val['species_taxon'])
+                n_matches += len(lookup[gene])
+        if n_matches == 0:
+            continue
+        gene_idx += [len(multiplicity)]*n_matches
+        multiplicity.append(n_occurrences)
+
+    if len(taxon) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    gene_idx = np.array(gene_idx)
+    taxon = np.array(taxon)
+    multiplicity = np.array(multiplicity)
+
+    # count how often each gene matched each taxon
+    order = np.lexsort((taxon, gene_idx))
+    gene_idx = gene_idx[order]
+    taxon = taxon[order]
+    pair_starts = np.flatnonzero(
+        np.concatenate(
+            [[True],
+             (gene_idx[1:] != gene_idx[:-1]) | (taxon[1:] != taxon[:-1])]
+        )
+    )
+    pair_gene = gene_idx[pair_starts]
+    pair_taxon = taxon[pair_starts]
+    pair_ct = np.diff(np.append(pair_starts, len(gene_idx)))
+
+    # each gene votes for the taxons it matched most often
+    gene_starts = np.flatnonzero(
+        np.concatenate([[True], pair_gene[1:] != pair_gene[:-1]])
+    )
+    gene_max = np.maximum.reduceat(pair_ct, gene_starts)
+    gene_max = np.repeat(
+        gene_max,
+        np.diff(np.append(gene_starts, len(pair_gene)))
+    )
+    is_vote = (pair_ct == gene_max)
+
+    votes, inverse = np.unique(pair_taxon[is_vote], return_inverse=True)
+    cts = np.bincount(
+        inverse,
+        weights=multiplicity[pair_gene[is_vote]]
+    ).astype(int)
+    return votes, cts
+
+
+@functools.lru_cache(maxsize=64)
+def _get_species_name_cached(
+        db_path_str,
+        mtime_ns,
+        size,
+        species_taxon):
+    """
+    Return the name of the species with taxon species_taxon in the
+    database at db_path_str (see query_utils._get_species_name).
+    mtime_ns and size are only used to key the cache, so that a
+    modified database is queried again.
+    """
+    with sqlite3.connect(db_path_str) as conn:
+        query_utils.tune_read_connection(conn)
+        conn.execute("PRAGMA query_only=1")
+        return query_utils._get_species_name(
+            cursor=conn.cursor(),
+            species_taxon=species_taxon
+        )
+
+
 def species_from_identifier(
         db_path,
         gene_list,
-        chunk_size=10000,
-        log=None):
+        chunk_size=None,
+        n_workers=1,
+        log=None,
+        cache=None):
     """
     Return a dict mapping the gene_identifiers in gene_list
     to (authority, species_taxon) pairs
+
+    If chunk_size is None, all of gene_list is matched
+    against the database with a single query.
+
+    If cache (a SpeciesLookupCache) is not None, results
+    are cached in it.
     """
     return _species_from_column(
         db_path=db_path,
         gene_list=gene_list,
         col_name="identifier",
         chunk_size=chunk_size,
-        log=log
+        n_workers=n_workers,
+        log=log,
+        cache=cache
     )
 
 
 def species_from_symbol(
         db_path,
         gene_list,
-        chunk_size=10000,
-        log=None):
+        chunk_size=None,
+        n_workers=1,
+        log=None,
+        cache=None):
     """
     Return a dict mapping the gene_identifiers in gene_list
     to (authority, species_taxon) pairs
+
+    If chunk_size is None, all of gene_list is matched
+    against the database with a single query.
+
+    If cache (a SpeciesLookupCache) is not None, results
+    are cached in it.
     """
     return _species_from_column(
         db_path=db_path,
         gene_list=gene_list,
         col_name="symbol",
         chunk_size=chunk_size,
-        log=log
+        n_workers=n_workers,
+        log=log,
+        cache=cache
     )
 
 
@@ -236,7 +400,34 @@ def _species_from_column(
         gene_list,
         col_name,
         chunk_size,
-        log=None):
+        n_workers=1,
+        log=None,
+        read_only=False,
+        cache=None):
+    """
+    Return a dict mapping the values in gene_list to the
+    (authority, species_taxon) pairs they match in
+    gene.{col_name}.
+
+    If n_workers > 1, gene_list is split into n_workers slices
+    which are queried concurrently, each with its own
+    connection to the database.
+
+    If chunk_size is None, each slice of gene_list is written to
+    a temporary table and matched with a single JOIN.
+
+    If cache (a SpeciesLookupCache) is not None, results are
+    cached in it (keyed on the database file's path, modification
+    time and size as well as the inputs). The cache holds a
+    read-only copy of the results. If read_only is True, that copy
+    is returned as it is (a mapping from gene to a tuple of
+    read-only match mappings), so a cache hit costs nothing beyond
+    building the key. Otherwise, a new dict that the caller is
+    free to modify is returned.
+
+    If read_only is True, the caller must not modify the result
+    (whether or not it came from the cache).
+    """
 
     if log is None:
         log = log_class.StdoutLog()
@@ -251,43 +442,331 @@ def _species_from_column(
     if not db_path.is_file():
         raise RuntimeError(f"db_path {db_path} is not a file")
 
+    if isinstance(gene_list, np.ndarray):
+        gene_list = gene_list.tolist()
+
+    # the result is a dict keyed on gene, so each distinct gene
+    # only needs to be queried once (dict.fromkeys drops repeats
+    # while keeping the order of first occurrence)
+    gene_tuple = tuple(dict.fromkeys(gene_list))
+
+    # read the flag once, so that it is both part of the cache
+    # key and what the workers use
+    favor_or_chains = _FAVOR_OR_CHAINS
+
+    if cache is None:
+        return _species_from_column_lookup(
+            db_path=db_path,
+            gene_list=gene_tuple,
+            col_name=col_name,
+            chunk_size=chunk_size,
+            n_workers=n_workers,
+            favor_or_chains=favor_or_chains
+        )
+
+    # mtime and size are part of the key so that a modified
+    # database is queried again
+    db_stat = db_path.stat()
+    key = (
+        str(db_path.resolve()),
+        db_stat.st_mtime_ns,
+        db_stat.st_size,
+        col_name,
+        favor_or_chains,
+        gene_tuple
+    )
+    frozen = cache.get(key)
+    if frozen is None:
+        frozen = _freeze_mapping(
+            _species_from_column_lookup(
+                db_path=db_path,
+                gene_list=gene_tuple,
+                col_name=col_name,
+                chunk_size=chunk_size,
+                n_workers=n_workers,
+                favor_or_chains=favor_or_chains
+            )
+        )
+        cache.put(key, frozen)
+
+    if read_only:
+        return frozen
+    return {
+        gene: [dict(val) for val in matches]
+        for gene, matches in frozen.items()
+    }
+
+
+class SpeciesLookupCache(object):
+    """
+    A small cache of the results of species_from_identifier and
+    species_from_symbol (the most recent maxsize lookups).
+
+    Nothing is cached unless one of these is passed in, so the
+    (possibly very large) inputs and results are only kept alive
+    as long as their owner (e.g. an MMCGeneMapper) keeps the cache.
+    It is safe to share between threads.
+    """
+
+    def __init__(self, maxsize=2):
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Return the value cached under key (None if there is none)
+        """
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        """
+        Cache value under key, dropping the least recently
+        used entries if there are more than maxsize
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def _species_from_column_lookup(
+        db_path,
+        gene_list,
+        col_name,
+        chunk_size,
+        n_workers,
+        favor_or_chains):
+    """
+    Do the work of _species_from_column for a list of distinct
+    genes. favor_or_chains is the value of _FAVOR_OR_CHAINS.
+    """
     n_genes = len(gene_list)
+    if n_workers <= 1 or (chunk_size is not None and n_genes <= chunk_size):
+        return _species_from_column_worker(
+            db_path=db_path,
+            gene_list=gene_list,
+            col_name=col_name,
+            chunk_size=chunk_size,
+            favor_or_chains=favor_or_chains
+        )
+
+    slice_size = int(np.ceil(n_genes/n_workers))
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=n_workers) as executor:
+        future_list = [
+            executor.submit(
+                _species_from_column_worker,
+                db_path=db_path,
+                gene_list=gene_list[i0:i0+slice_size],
+                col_name=col_name,
+                chunk_size=chunk_size,
+                favor_or_chains=favor_or_chains
+            )
+            for i0 in range(0, n_genes, slice_size)
+        ]
+        sub_mapping_list = [
+            future.result() for future in future_list
+        ]
+
     mapping = dict()
-    with sqlite3.connect(db_path) as conn:
+    for sub_mapping in sub_mapping_list:
+        for gene, matches in sub_mapping.items():
+            if gene not in mapping:
+                mapping[gene] = matches
+    return mapping
+
+
+def _freeze_mapping(mapping):
+    """
+    Convert a dict mapping genes to lists of
+    {'authority': ..., 'species_taxon': ...} dicts into the
+    read-only form held by a SpeciesLookupCache: a read-only
+    mapping from gene to a tuple of read-only match
+    mappings. There are only a few distinct matches (one per
+    authority and species), so they are shared between genes.
+    """
+    match_lookup = dict()
+    frozen = dict()
+    for gene, matches in mapping.items():
+        frozen_matches = []
+        for val in matches:
+            key = (val['authority'], val['species_taxon'])
+            if key not in match_lookup:
+                match_lookup[key] = types.MappingProxyType(dict(val))
+            frozen_matches.append(match_lookup[key])
+        frozen[gene] = tuple(frozen_matches)
+    return types.MappingProxyType(frozen)
+
+
+def _species_from_column_worker(
+        db_path,
+        gene_list,
+        col_name,
+        chunk_size,
+        favor_or_chains=False):
+    """
+    Query gene.{col_name} for the values in gene_list using
+    a dedicated connection to the database (so that this can be
+    run in its own thread).
+
+    If favor_or_chains is True, chunks of no more than
+    _MAX_OR_CHAIN_SIZE genes are queried with a chain of ORs
+    (see _FAVOR_OR_CHAINS).
+    """
+    n_genes = len(gene_list)
+    if chunk_size is None:
+        chunk_size = max(1, n_genes)
+
+    mapping = collections.defaultdict(list)
+    with sqlite3.connect(db_path, cached_statements=256) as conn:
+        query_utils.tune_read_connection(conn)
         cursor = conn.cursor()
-        for i0 in range(0, n_genes, chunk_size):
-            chunk = gene_list[i0: i0+chunk_size]
-            query = f"""
+        _create_gene_input_table(cursor)
+
+        # the authority table is tiny, so read it once rather than
+        # JOINing it against every match; this lets the gene lookups
+        # be answered from a covering index (e.g. gene_validity_idx1
+        # on identifier, authority, species_taxon) alone. Interning
+        # means all genes share the same few authority names
+        authority_lookup = {
+            authority_idx: sys.intern(name)
+            for authority_idx, name in cursor.execute(
+                "SELECT id, name FROM authority"
+            )
+        }
+
+        # CROSS JOIN forces SQLite to loop over the (small) input
+        # table and search the gene table, rather than scanning the
+        # whole gene table.
+        #
+        # to prevent multiple citation entries from skewing the count
+        # we group by (col_name, authority, species_taxon)
+        join_query = f"""
             SELECT
                 gene.{col_name},
                 gene.species_taxon,
-                authority.name
+                gene.authority
             FROM
-                gene
-            JOIN authority on gene.authority = authority.id
-            WHERE
-                gene.{col_name} IN (
-            """
-            query += ",".join(["?"]*len(chunk))
-            query += ")"
-
-            # to prevent multiple citation entries from skewing the count
-            query += f"""
-                GROUP BY gene.{col_name}, gene.authority, gene.species_taxon
-            """
-
-            results = cursor.execute(
-                query,
-                chunk
-            ).fetchall()
-            for row in results:
-                if row[0] not in mapping:
-                    mapping[row[0]] = []
-                mapping[row[0]].append(
-                    {'authority': row[2],
-                     'species_taxon': row[1]}
+                gene_input
+            CROSS JOIN gene ON gene.{col_name} = gene_input.gene
+            GROUP BY gene.{col_name}, gene.authority, gene.species_taxon
+        """
+
+        for i0 in range(0, n_genes, chunk_size):
+            chunk = gene_list[i0: i0+chunk_size]
+            if len(chunk) < _MIN_JOIN_CHUNK_SIZE:
+                # not worth populating the temporary table
+                # for a handful of genes.
+                #
+                # Pad short chunks with NULL (which never matches)
+                # so that every chunk uses the same query text and
+                # the prepared statement is reused
+                n_values = min(chunk_size, _MIN_JOIN_CHUNK_SIZE-1)
+                chunk = list(chunk) + [None]*(n_values-len(chunk))
+                results = cursor.execute(
+                    _species_in_list_query(
+                        col_name=col_name,
+                        n_values=n_values,
+                        or_chain=(
+                            favor_or_chains
+                            and n_values <= _MAX_OR_CHAIN_SIZE
+                        )
+                    ),
+                    chunk
                 )
-    return mapping
+            else:
+                cursor.execute("DELETE FROM gene_input")
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO gene_input (gene) VALUES (?)",
+                    [(gene,) for gene in chunk]
+                )
+                results = cursor.execute(join_query)
+
+            # iterate over the cursor rather than calling fetchall()
+            # so that the rows are not all materialized at once
+            for gene, species_taxon, authority_idx in results:
+                # (genes whose authority is not in the authority
+                # table would have been dropped by a JOIN)
+                authority = authority_lookup.get(authority_idx)
+                if authority is None:
+                    continue
+                mapping[gene].append(
+                    {'authority': authority,
+                     'species_taxon': species_taxon}
+                )
+        cursor.execute("DROP TABLE IF EXISTS temp.gene_input")
+
+    # return a plain dict so that looking up a missing gene
+    # does not silently insert it
+    return dict(mapping)
+
+
+@functools.lru_cache(maxsize=16)
+def _species_in_list_query(col_name, n_values, or_chain=False):
+    """
+    Return the text of the query matching n_values genes against
+    gene.{col_name} with an 'IN (?, ?, ...)' clause (or, if or_chain
+    is True, with a chain of 'gene.{col_name} = ?' joined by OR).
+
+    The text is cached so that it is not rebuilt for every
+    chunk of genes.
+    """
+    query = f"""
+    SELECT
+        gene.{col_name},
+        gene.species_taxon,
+        gene.authority
+    FROM
+        gene
+    WHERE
+    """
+    if or_chain:
+        query += " OR ".join([f"gene.{col_name} = ?"]*n_values)
+    else:
+        query += f"gene.{col_name} IN ("
+        query += ",".join(["?"]*n_values)
+        query += ")"
+    query += f"""
+    GROUP BY
+        gene.{col_name}, gene.authority, gene.species_taxon
+    """
+    return query
+
+
+def _create_gene_input_table(cursor):
+    """
+    Create the temporary table into which chunks of input
+    genes are written so that they can be JOINed against
+    the gene table (rather than building a new
+    'IN (?, ?, ...)' query for every chunk)
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.gene_input")
+    cursor.execute(
+        """
+        CREATE TEMP TABLE gene_input (
+            gene TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+        """
+    )
 
 
 def detect_if_genes(
@@ -312,35 +791,40 @@ def detect_if_genes(
             "(error in "
             "mmc_gene_mapper.mapper.species_detection.detect_if_genes)"
         )
-    with sqlite3.connect(db_path) as conn:
+    with sqlite3.connect(db_path, cached_statements=256) as conn:
+        query_utils.tune_read_connection(conn)
+        conn.execute("PRAGMA query_only=1")
         cursor = conn.cursor()
-        for i0 in range(0, len(gene_list), chunk_size):
-            chunk = gene_list[i0:i0+chunk_size]
-            id_query = """
-            SELECT
-                COUNT(identifier)
-            FROM
-                gene
-            WHERE
-                identifier IN (
-            """
-            id_query += ",".join([f'"{g}"' for g in chunk])
-            id_query += ")"
-            result = cursor.execute(id_query).fetchall()
-            if result[0][0] > 0:
-                return True
-            symbol_query = """
-            SELECT
-                COUNT(symbol)
+
+        # each chunk is bound twice (once for identifier, once for
+        # symbol), so it can be at most half as long as the number
+        # of parameters SQLite allows
+        chunk_size = query_utils.clamp_chunk_size(2*chunk_size)//2
+        n_values = max(1, min(chunk_size, len(gene_list)))
+        placeholders = ",".join(["?"]*n_values)
+
+        # a single query checks both columns; EXISTS lets SQLite
+        # stop at the first matching row rather than finding
+        # all of them
+        query = f"""
+        SELECT EXISTS (
+            SELECT 1
             FROM
                 gene
             WHERE
-                symbol IN (
-            """
-            symbol_query += ",".join([f'"{g}"' for g in chunk])
-            symbol_query += ")"
-            result = cursor.execute(symbol_query).fetchall()
-            if result[0][0] > 0:
+                identifier IN ({placeholders})
+            OR
+                symbol IN ({placeholders})
+        )
+        """
+        for i0 in range(0, len(gene_list), chunk_size):
+            chunk = list(gene_list[i0:i0+chunk_size])
+
+            # pad the last chunk with NULL (which never matches)
+            # so that every chunk uses the same prepared statement
+            chunk += [None]*(n_values-len(chunk))
+            result = cursor.execute(query, chunk+chunk).fetchone()
+            if result[0] > 0:
                 return True
     return False
 
@@ -1,3 +1,6 @@
+import collections
+import copy
+import functools
 import json
 import pathlib
 import sqlite3
@@ -6,6 +9,119 @@ import mmc_gene_mapper.metadata.classes as metadata_classes
 import mmc_gene_mapper.create_db.metadata_tables as metadata_utils
 
 
+def tune_read_connection(conn):
+    """
+    Set the PRAGMAs for a sqlite3 connection that will be used
+    to perform many lookups against a static database (memory
+    mapped I/O, a large page cache and in-memory temporary tables).
+
+    Parameters
+    ----------
+    conn:
+        a sqlite3 connection
+
+    Returns
+    -------
+    None
+
+    Notes
+    -----
+    This does not set query_only, since the lookup functions
+    write genes to temporary tables.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA mmap_size=1073741824")
+    cursor.execute("PRAGMA cache_size=-131072")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+
+
+def clamp_chunk_size(chunk_size, n_fixed=0):
+    """
+    Return chunk_size, reduced (if necessary) so that a query binding
+    chunk_size values along with n_fixed other parameters does not
+    exceed the limit on the number of parameters SQLite allows in
+    a single statement.
+
+    Parameters
+    ----------
+    chunk_size:
+        an int; the requested number of values per query
+    n_fixed:
+        an int; the number of other parameters bound in the query
+
+    Returns
+    -------
+    an int; the number of values that can safely be bound per query
+    """
+    return max(1, min(chunk_size, _max_variable_number()-n_fixed))
+
+
+@functools.lru_cache(maxsize=1)
+def _max_variable_number():
+    """
+    Return the maximum number of parameters that can be bound
+    to a single SQLite statement
+    """
+    if hasattr(sqlite3, 'SQLITE_LIMIT_VARIABLE_NUMBER'):
+        # python >= 3.11; ask the library itself
+        conn = sqlite3.connect(':memory:')
+        try:
+            return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        finally:
+            conn.close()
+    if sqlite3.sqlite_version_info >= (3, 32, 0):
+        return 32766
+    return 999
+
+
+@functools.lru_cache(maxsize=1)
+def json_each_available():
+    """
+    Return True if the SQLite library supports the json_each
+    table-valued function (built in by default since 3.38; a
+    compile-time option before that)
+    """
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute("SELECT value FROM json_each('[1]')").fetchall()
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+    return True
+
+
+def _to_json_array(values):
+    """
+    Serialize a list of values (possibly numpy scalars) as
+    a JSON array to be passed to json_each
+    """
+    return json.dumps(
+        [v.item() if hasattr(v, 'item') else v for v in values]
+    )
+
+
+def _in_list_clause(values):
+    """
+    Return the text of a parenthesized clause to follow 'IN'
+    matching the values in values, and the parameters to bind
+    to it.
+
+    If json_each is available, values are passed as a single JSON
+    array so that the text does not depend on len(values).
+    Otherwise, the clause is '(?, ?, ...)'.
+    """
+    if json_each_available():
+        return (
+            "(SELECT value FROM json_each(?))",
+            (_to_json_array(values),)
+        )
+    return (
+        "(" + ",".join(['?']*len(values)) + ")",
+        tuple(values)
+    )
+
+
 def get_species(
         cursor,
         species):
@@ -169,30 +285,33 @@ def get_citation_from_bibliography(
     returned, try running again with require_symbols=True
     to see if you only get one citation back.
     """
-    query = """
-        SELECT
-            citation
-        FROM
-            species_bibliography
+    where_clause = """
         WHERE
             species_taxon=?
         AND
             authority=?
     """
     if require_symbols:
-        query += """
+        where_clause += """
             AND
                has_symbols=1
             """
 
+    # only need to know whether there is exactly one citation,
+    # so stop after finding a second distinct one
     raw = cursor.execute(
-        query,
+        f"""
+        SELECT DISTINCT
+            citation
+        FROM
+            species_bibliography
+        {where_clause}
+        LIMIT 2
+        """,
         (species.taxon, authority_idx)
     ).fetchall()
 
-    results = set([r[0] for r in raw])
-
-    if len(results) != 1:
+    if len(raw) != 1:
         if not require_symbols:
             return get_citation_from_bibliography(
                 cursor=cursor,
@@ -213,13 +332,24 @@ def get_citation_from_bibliography(
             if len(full_authority) == 0:
                 full_authority = authority_idx
 
+            n_citations = cursor.execute(
+                f"""
+                SELECT
+                    COUNT(DISTINCT citation)
+                FROM
+                    species_bibliography
+                {where_clause}
+                """,
+                (species.taxon, authority_idx)
+            ).fetchone()[0]
+
             raise UnclearCitationError(
-                f"There are {len(results)} citations associated "
+                f"There are {n_citations} citations associated "
                 f"with authority={full_authority}, "
                 f"species_taxon={species.taxon}; "
                 "unclear how to proceed"
             )
-    citation_idx = results.pop()
+    citation_idx = raw[0][0]
     raw = cursor.execute(
         """
         SELECT
@@ -302,6 +432,34 @@ def get_authority_and_citation(
     }
 
 
+@functools.lru_cache(maxsize=64)
+def _get_authority_and_citation_cached(
+        db_path_str,
+        mtime_ns,
+        size,
+        authority_name,
+        species_name,
+        species_taxon,
+        require_symbols):
+    """
+    Call get_authority_and_citation on the database at db_path_str.
+    mtime_ns and size are only used to key the cache, so that a
+    modified database is queried again. The returned dicts are
+    shared between calls and must not be modified.
+    """
+    with sqlite3.connect(db_path_str) as conn:
+        tune_read_connection(conn)
+        return get_authority_and_citation(
+            conn=conn,
+            authority_name=authority_name,
+            species=metadata_classes.Species(
+                name=species_name,
+                taxon=species_taxon
+            ),
+            require_symbols=require_symbols
+        )
+
+
 def translate_gene_identifiers(
         db_path,
         src_column,
@@ -331,6 +489,9 @@ def translate_gene_identifiers(
         for val in src_list
     }
 
+    # only query each distinct value once
+    src_list = list(results.keys())
+
     if src_column == 'symbol':
         mapping_src = metadata_classes.Authority('symbol')
     else:
@@ -341,15 +502,27 @@ def translate_gene_identifiers(
     else:
         mapping_dst = metadata_classes.Authority(authority_name)
 
-    with sqlite3.connect(db_path) as conn:
-
-        meta_source = get_authority_and_citation(
-            conn=conn,
+    # the authority and citation only depend on the database
+    # contents, so they are looked up through a cache keyed on
+    # the database file; copy them so that the cached dicts are
+    # never modified
+    does_path_exist(db_path)
+    db_path = pathlib.Path(db_path)
+    db_stat = db_path.stat()
+    meta_source = copy.deepcopy(
+        _get_authority_and_citation_cached(
+            db_path_str=str(db_path.resolve()),
+            mtime_ns=db_stat.st_mtime_ns,
+            size=db_stat.st_size,
             authority_name=authority_name,
-            species=species,
+            species_name=species.name,
+            species_taxon=species.taxon,
             require_symbols=require_symbols
         )
+    )
 
+    with sqlite3.connect(db_path) as conn:
+        tune_read_connection(conn)
         full_authority = meta_source['authority']
         full_citation = meta_source['citation']
 
@@ -357,38 +530,51 @@ def translate_gene_identifiers(
         citation_idx = full_citation["idx"]
 
         cursor = conn.cursor()
-        n_vals = len(src_list)
-        for i0 in range(0, n_vals, chunk_size):
-            values = src_list[i0:i0+chunk_size]
-            n_values = len(values)
-
-            query = f"""
-                SELECT
-                    {src_column},
-                    {dst_column}
-                FROM gene
-                WHERE
-                    citation=?
-                AND
-                    authority=?
-                AND
-                    species_taxon=?
-                AND
-                    {src_column} IN (
-                """
-            query += ",".join(['?']*n_values)
-            query += ")"
+        query = f"""
+            SELECT
+                {src_column},
+                {dst_column}
+            FROM gene
+            WHERE
+                citation=?
+            AND
+                authority=?
+            AND
+                species_taxon=?
+            AND
+                {src_column} IN
+            """
+        if json_each_available():
+            # pass all of the values as a single JSON array so that
+            # one statement (whose text does not depend on the number
+            # of values) does all of the work
             raw = cursor.execute(
-                query,
+                query + "(SELECT value FROM json_each(?))",
                 (citation_idx,
                  authority_idx,
                  species.taxon,
-                 *values)
-            ).fetchall()
-            for row in raw:
-                val = row[0]
-                identifier = row[1]
+                 _to_json_array(src_list))
+            )
+            for val, identifier in raw:
                 results[val].add(identifier)
+        else:
+            n_vals = len(src_list)
+            chunk_size = clamp_chunk_size(chunk_size, n_fixed=3)
+            for i0 in range(0, n_vals, chunk_size):
+                values = src_list[i0:i0+chunk_size]
+                n_values = len(values)
+                chunk_query = (
+                    query + "(" + ",".join(['?']*n_values) + ")"
+                )
+                raw = cursor.execute(
+                    chunk_query,
+                    (citation_idx,
+                     authority_idx,
+                     species.taxon,
+                     *values)
+                )
+                for val, identifier in raw:
+                    results[val].add(identifier)
 
         for key in results:
             results[key] = sorted(results[key])
@@ -426,7 +612,7 @@ def get_equivalent_genes_from_identifiers(
 
     id_values = set()
     for key in id_translation['mapping']:
-        id_values = id_values.union(set(id_translation['mapping'][key]))
+        id_values.update(id_translation['mapping'][key])
 
     equivalence = _get_equivalent_genes(
         db_path=db_path,
@@ -477,7 +663,7 @@ def _get_equivalent_genes(
         for ii in input_id_list
     }
     with sqlite3.connect(db_path) as conn:
-
+        tune_read_connection(conn)
         full_citation = metadata_utils.get_citation(
             conn=conn,
             name=citation_name
@@ -494,11 +680,16 @@ def _get_equivalent_genes(
         )["idx"]
 
         cursor = conn.cursor()
+        if json_each_available():
+            # one JSON array parameter can hold all of the values
+            chunk_size = max(1, len(input_id_list))
+        else:
+            chunk_size = clamp_chunk_size(chunk_size, n_fixed=4)
         for i0 in range(0, len(input_id_list), chunk_size):
             values = [
                 ii for ii in input_id_list[i0:i0+chunk_size]
             ]
-            n_values = len(values)
+            in_clause, in_params = _in_list_clause(values)
             query = """
             SELECT
                 gene0,
@@ -513,19 +704,20 @@ def _get_equivalent_genes(
             AND
                 species_taxon=?
             AND
-                gene0 IN (
+                gene0 IN
             """
-            query += ",".join(['?']*n_values)
-            query += ")"
+            query += in_clause
             chunk = cursor.execute(
                 query,
                 (full_citation['idx'],
                  input_auth,
                  output_auth,
                  species_taxon,
-                 *values)).fetchall()
-            for row in chunk:
-                results[row[0]].append(row[1])
+                 *in_params))
+            # iterate over the cursor rather than materializing
+            # all of the rows with fetchall()
+            for gene0, gene1 in chunk:
+                results[gene0].append(gene1)
 
     return {
         'metadata': metadata_classes.MappingMetadata(
@@ -560,7 +752,7 @@ def get_ortholog_genes_from_identifiers(
 
     id_values = set()
     for key in id_translation['mapping']:
-        id_values = id_values.union(set(id_translation['mapping'][key]))
+        id_values.update(id_translation['mapping'][key])
 
     orthologs = _get_ortholog_genes(
         db_path=db_path,
@@ -622,9 +814,10 @@ def _get_ortholog_genes(
     """
     does_path_exist(db_path)
 
-    results = dict()
+    results = collections.defaultdict(list)
 
     with sqlite3.connect(db_path) as conn:
+        tune_read_connection(conn)
         citation = metadata_utils.get_citation(
             conn=conn,
             name=citation_name
@@ -637,8 +830,14 @@ def _get_ortholog_genes(
 
         cursor = conn.cursor()
 
+        if json_each_available():
+            # one JSON array parameter can hold all of the genes
+            chunk_size = max(1, len(src_genes))
+        else:
+            chunk_size = clamp_chunk_size(chunk_size, n_fixed=3)
         for i0 in range(0, len(src_genes), chunk_size):
             gene_chunk = tuple(src_genes[i0:i0+chunk_size])
+            in_clause, in_params = _in_list_clause(gene_chunk)
             query = """
                 SELECT
                     gene,
@@ -652,23 +851,21 @@ def _get_ortholog_genes(
                 AND
                     species=?
                 AND
-                    gene IN (
+                    gene IN
             """
-            query += ",".join(['?']*len(gene_chunk))
-            query += ")"
+            query += in_clause
             gene_to_ortholog = cursor.execute(
                 query,
                 (authority_idx,
                  citation['idx'],
                  src_species.taxon,
-                 *gene_chunk)
+                 *in_params)
             ).fetchall()
             n_raw = len(gene_to_ortholog)
 
-            gene_to_ortholog = {
-                row[0]: row[1]
-                for row in gene_to_ortholog
-            }
+            # a duplicated key will collapse in the dict,
+            # which is detected by the change in length
+            gene_to_ortholog = dict(gene_to_ortholog)
             if len(gene_to_ortholog) != n_raw:
                 raise ValueError(
                     "gene_to_ortholog was not unique"
@@ -677,6 +874,7 @@ def _get_ortholog_genes(
             ortholog_chunk = tuple(
                 set(gene_to_ortholog.values())
             )
+            in_clause, in_params = _in_list_clause(ortholog_chunk)
 
             query = """
                 SELECT
@@ -691,23 +889,21 @@ def _get_ortholog_genes(
                 AND
                     species=?
                 AND
-                    ortholog_group IN (
+                    ortholog_group IN
             """
-            query += ",".join(['?']*len(ortholog_chunk))
-            query += ")"
+            query += in_clause
             ortholog_to_other_gene = cursor.execute(
                 query,
                 (authority_idx,
                  citation['idx'],
                  dst_species.taxon,
-                 *ortholog_chunk)
+                 *in_params)
             ).fetchall()
             n_raw = len(ortholog_to_other_gene)
 
-            ortholog_to_other_gene = {
-                row[0]: row[1]
-                for row in ortholog_to_other_gene
-            }
+            # a duplicated key will collapse in the dict,
+            # which is detected by the change in length
+            ortholog_to_other_gene = dict(ortholog_to_other_gene)
             if len(ortholog_to_other_gene) != n_raw:
                 raise ValueError(
                     "ortholog_to_other_gene was not unique"
@@ -717,8 +913,6 @@ def _get_ortholog_genes(
                 orth = gene_to_ortholog[gene]
                 if orth not in ortholog_to_other_gene:
                     continue
-                if gene not in results:
-                    results[gene] = []
                 results[gene].append(ortholog_to_other_gene[orth])
 
     return {
@@ -727,7 +921,7 @@ def _get_ortholog_genes(
                 dst=dst_species,
                 citation=citation['metadata']
         ).serialize(),
-        'mapping': results
+        'mapping': dict(results)
     }
 
 
@@ -778,7 +972,7 @@ def mapping_dict_to_identifiers(
 
     value_list = set()
     for key in mapping_dict:
-        value_list = value_list.union(set(mapping_dict[key]))
+        value_list.update(mapping_dict[key])
     value_list = sorted(value_list)
 
     value_mapping, _ = _strict_mapping_from_id(
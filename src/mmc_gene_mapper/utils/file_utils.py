@@ -88,18 +88,33 @@ def mkstemp_clean(
     return file_path
 
 
-def hash_from_path(file_path, chunk_bytes=100000000):
+def hash_from_path(file_path, chunk_bytes=None):
     """
     Return md5 hash for file at file_path
     (raises an error if file_path does not point to a file)
+
+    chunk_bytes is the number of bytes read at a time. If it is
+    None and hashlib.file_digest is available (python >= 3.11),
+    file_digest does the reading with its own buffer size;
+    otherwise the file is read 100000000 bytes at a time.
     """
     file_path = pathlib.Path(file_path)
     if not file_path.is_file():
         raise RuntimeError(
             f"{file_path} is not a file"
         )
-    hasher = hashlib.md5()
     with open(file_path, 'rb') as src:
+        if chunk_bytes is None and hasattr(hashlib, 'file_digest'):
+            # python >= 3.11; reads into a reusable buffer
+            # (bypassing the allocation of a new bytes object
+            # per chunk) and releases the GIL while hashing
+            hasher = hashlib.file_digest(src, 'md5')
+            return f"md5:{hasher.hexdigest()}"
+
+        if chunk_bytes is None:
+            chunk_bytes = 100000000
+
+        hasher = hashlib.md5()
         while True:
             chunk = src.read(chunk_bytes)
             if len(chunk) == 0:
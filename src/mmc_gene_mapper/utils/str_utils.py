@@ -15,6 +15,12 @@ def int_from_identifier(identifier):
     return int(result[0])
 
 
+# a gene identifier is an ENSEMBL (NCBI) identifier if it is
+# exactly an ENSEMBL (NCBI) prefix followed by an integer
+_ENSEMBL_ID_PATTERN = re.compile('ENS[A-Z]+[0-9]+')
+_NCBI_ID_PATTERN = re.compile('NCBI[A-Za-z]*[:]?[0-9]+')
+
+
 def characterize_gene_identifiers_by_re(
         gene_id_list):
     """
@@ -27,29 +33,24 @@ def characterize_gene_identifiers_by_re(
     what is an NCBI identifier and what is
     an ENSEMBL identifier.
     """
-    int_pattern = re.compile('[0-9]+')
-    ens_prefix_pattern = re.compile('ENS[A-Z]+')
-    ncbi_prefix_pattern = re.compile('NCBI[A-Za-z]*[:]?')
+    ens_match = _ENSEMBL_ID_PATTERN.fullmatch
+    ncbi_match = _NCBI_ID_PATTERN.fullmatch
     result = []
     for gene_id in gene_id_list:
-        ival = int_pattern.findall(gene_id)
-        assn = None
-        if len(ival) > 0:
-            ival = ival[0]
-            ens_prefix = ens_prefix_pattern.match(gene_id)
-            ncbi_prefix = ncbi_prefix_pattern.match(gene_id)
-            if ens_prefix is not None and len(ival) > 0:
-                if gene_id == f'{ens_prefix.group(0)}{ival}':
-                    assn = 'ENSEMBL'
-            elif ncbi_prefix is not None and len(ival) > 0:
-                if gene_id == f'{ncbi_prefix.group(0)}{ival}':
-                    assn = 'NCBI'
-        if assn is None:
+        if ens_match(gene_id) is not None:
+            assn = 'ENSEMBL'
+        elif ncbi_match(gene_id) is not None:
+            assn = 'NCBI'
+        else:
             assn = 'symbol'
         result.append(assn)
     return result
 
 
+# an ENSEMBL identifier with a version suffix
+_ENSEMBL_VERSIONED_PATTERN = re.compile('ENS[A-Za-z0-9]+\\.[0-9]+')
+
+
 def remove_ensembl_versions(gene_list):
     """
     Take a list of gene identifiers. Any that match the form
@@ -59,17 +60,16 @@ def remove_ensembl_versions(gene_list):
     appended to their ENSEMBL IDs. Note that it is only a valid solution
     so long as no valid identifiers or symbols match the relevant pattern.
     """
-    pattern = re.compile('ENS[A-Za-z0-9]+\\.[0-9]+')
+    versioned_match = _ENSEMBL_VERSIONED_PATTERN.fullmatch
     result = []
     for gene in gene_list:
-        gene_match = pattern.match(gene)
-        needs_trimming = False
-        if gene_match is not None:
-            if gene_match.span()[0] == 0:
-                if gene_match.span()[1] == len(gene):
-                    needs_trimming = True
-
-        if needs_trimming:
+        # cheap literal checks so that the regex is only
+        # run on genes that could possibly match it
+        if not gene.startswith('ENS') or '.' not in gene:
+            result.append(gene)
+            continue
+
+        if versioned_match(gene) is not None:
             result.append(gene.split('.')[0])
         else:
             result.append(gene)
@@ -5,6 +5,7 @@ import warnings
 
 import mmc_gene_mapper.mapper.species_detection as species_detection
 import mmc_gene_mapper.mapper.mapper as mapper_module
+import mmc_gene_mapper.query_db.query as query_utils
 
 
 @pytest.mark.parametrize(
@@ -235,6 +236,7 @@ import mmc_gene_mapper.mapper.mapper as mapper_module
       None),
     ]
 )
+@pytest.mark.parametrize('use_json_each', [True, False])
 def test_arbitrary_mapping(
         mapper_db_path_fixture,
         gene_list,
@@ -242,7 +244,15 @@ def test_arbitrary_mapping(
         dst_authority,
         expected,
         err_flavor,
-        err_msg):
+        err_msg,
+        use_json_each,
+        monkeypatch):
+
+    monkeypatch.setattr(
+        query_utils,
+        'json_each_available',
+        lambda: use_json_each
+    )
 
     mapper = mapper_module.MMCGeneMapper(
         db_path=mapper_db_path_fixture
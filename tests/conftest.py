@@ -2,6 +2,9 @@ import pytest
 
 from mmc_gene_mapper.utils.file_utils import (
     clean_up)
+import mmc_gene_mapper.mapper.mapper as mapper_module
+import mmc_gene_mapper.mapper.species_detection as species_detection
+import mmc_gene_mapper.query_db.query as query_utils
 
 
 @pytest.fixture(scope='session')
@@ -10,3 +13,14 @@ def tmp_dir_fixture(
     result = tmp_path_factory.mktemp('mmc_gene_mapper_')
     yield result
     clean_up(result)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches_fixture():
+    """
+    Make sure that no test sees results cached by another
+    """
+    species_detection._get_species_name_cached.cache_clear()
+    mapper_module._validate_db.cache_clear()
+    query_utils._get_authority_and_citation_cached.cache_clear()
+    yield
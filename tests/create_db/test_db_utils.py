@@ -1,4 +1,5 @@
 import pytest
+import sqlite3
 import tempfile
 
 import mmc_gene_mapper.utils.file_utils as file_utils
@@ -13,3 +14,25 @@ def test_check_existence(tmp_dir_fixture):
     assert not db_utils.check_existence('absolute_garbage.txt')
     with pytest.raises(file_utils.NotAFileError, match='is not a file'):
         db_utils.check_existence(tmp_dir)
+
+
+@pytest.mark.parametrize('unsafe_fast_writes', [True, False])
+def test_tune_build_connection(tmp_dir_fixture, unsafe_fast_writes):
+    """
+    Test that fsync is only turned off when explicitly requested
+    """
+    db_path = file_utils.mkstemp_clean(
+        dir=tmp_dir_fixture,
+        suffix='.db'
+    )
+    with sqlite3.connect(db_path) as conn:
+        default = conn.execute("PRAGMA synchronous").fetchone()[0]
+        db_utils.tune_build_connection(
+            conn,
+            unsafe_fast_writes=unsafe_fast_writes
+        )
+        actual = conn.execute("PRAGMA synchronous").fetchone()[0]
+    if unsafe_fast_writes:
+        assert actual == 0
+    else:
+        assert actual == default
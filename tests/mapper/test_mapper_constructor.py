@@ -4,6 +4,7 @@ a MMCGeneMapper from a bad file
 """
 import pytest
 
+import pickle
 import sqlite3
 
 import mmc_gene_mapper.utils.file_utils as file_utils
@@ -63,3 +64,128 @@ def test_mapper_from_db_with_wrong_validity(tmp_dir_fixture):
         )
     with pytest.raises(mapper_module.MalformedMapperDBError):
         mapper_module.MMCGeneMapper(db_path)
+
+
+@pytest.fixture
+def valid_db_fixture(tmp_dir_fixture):
+    """
+    A minimal database that is marked as a valid mmc_gene_mapper
+    database
+    """
+    db_path = file_utils.mkstemp_clean(
+       dir=tmp_dir_fixture,
+       suffix='.db'
+    )
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "CREATE TABLE mmc_gene_mapper_metadata (validity TEXT)"
+        )
+        cursor.execute(
+            """
+            INSERT INTO mmc_gene_mapper_metadata (validity)
+            VALUES ('TRUE')
+            """
+        )
+        cursor.execute(
+            "CREATE TABLE authority (id INTEGER, name TEXT)"
+        )
+        cursor.execute(
+            """
+            INSERT INTO authority (id, name)
+            VALUES (0, 'NCBI'), (1, 'ENSEMBL')
+            """
+        )
+    return db_path
+
+
+def test_mapper_shared_connection(valid_db_fixture):
+    """
+    Test that the mapper reuses one connection for its queries
+    """
+    mapper = mapper_module.MMCGeneMapper(valid_db_fixture)
+    conn = mapper._conn
+    assert conn is not None
+    assert mapper.get_all_authorities() == ['NCBI', 'ENSEMBL']
+    assert mapper.get_all_authorities() == ['NCBI', 'ENSEMBL']
+    assert mapper._conn is conn
+    mapper.close()
+
+
+def test_mapper_close(valid_db_fixture):
+    """
+    Test that close() closes the connection and that the mapper
+    reconnects if it is used again
+    """
+    mapper = mapper_module.MMCGeneMapper(valid_db_fixture)
+    conn = mapper._conn
+    mapper._species_cache.put('key', 'value')
+    mapper.close()
+    assert mapper._conn is None
+    assert len(mapper._species_cache) == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+    # closing twice is harmless
+    mapper.close()
+
+    assert mapper.get_all_authorities() == ['NCBI', 'ENSEMBL']
+    assert mapper._conn is not None
+    mapper.close()
+
+
+def test_mapper_new_process(valid_db_fixture, monkeypatch):
+    """
+    Test that the connection is not reused in a process other
+    than the one that opened it (e.g. after a fork)
+    """
+    mapper = mapper_module.MMCGeneMapper(valid_db_fixture)
+    conn = mapper._conn
+    monkeypatch.setattr(mapper_module.os, 'getpid', lambda: -1)
+    assert mapper.get_all_authorities() == ['NCBI', 'ENSEMBL']
+    assert mapper._conn is not conn
+
+    # the original connection is left alone
+    conn.execute("SELECT 1")
+    conn.close()
+    mapper.close()
+
+
+def test_mapper_pickle(valid_db_fixture):
+    """
+    Test that a mapper can be pickled (e.g. to send it to
+    a multiprocessing worker)
+    """
+    mapper = mapper_module.MMCGeneMapper(valid_db_fixture)
+    mapper._species_cache.put('key', 'value')
+    roundtrip = pickle.loads(pickle.dumps(mapper))
+    assert roundtrip._conn is None
+    assert len(roundtrip._species_cache) == 0
+    assert len(mapper._species_cache) == 1
+    assert roundtrip.db_path == mapper.db_path
+    assert roundtrip.get_all_authorities() == ['NCBI', 'ENSEMBL']
+    assert mapper.get_all_authorities() == ['NCBI', 'ENSEMBL']
+    roundtrip.close()
+    mapper.close()
+
+
+def test_validate_db_cache(valid_db_fixture):
+    """
+    Test that the validity check is only repeated if the
+    database file changes
+    """
+    cache = mapper_module._validate_db
+    for _ in range(3):
+        mapper_module.MMCGeneMapper(valid_db_fixture).close()
+    assert cache.cache_info().misses == 1
+    assert cache.cache_info().hits == 2
+
+    with sqlite3.connect(valid_db_fixture) as conn:
+        conn.execute(
+            "UPDATE mmc_gene_mapper_metadata SET validity='FALSE'"
+        )
+        conn.execute(
+            "INSERT INTO authority (id, name) VALUES (2, 'other')"
+        )
+    with pytest.raises(mapper_module.MalformedMapperDBError):
+        mapper_module.MMCGeneMapper(valid_db_fixture)
@@ -27,6 +27,14 @@ import mmc_gene_mapper.mapper.mapper_utils as mapper_utils
        'g',
        'UNMAPPABLE_DEGENERATE_0_1'],
       4),
+     (['x', 'UNMAPPABLE_DEGENERATE_3_0', 'x', 'y', 'x'],
+      None,
+      ['UNMAPPABLE_DEGENERATE_4_0',
+       'UNMAPPABLE_DEGENERATE_3_0',
+       'UNMAPPABLE_DEGENERATE_4_1',
+       'y',
+       'UNMAPPABLE_DEGENERATE_4_2'],
+      2),
      ]
 )
 def test_mask_degenerate_ids(
@@ -207,3 +215,22 @@ def test_multiple_duplicate_levels():
         'UNMAPPABLE_DEGENERATE_2_1'
     ]
     assert result['gene_list'] == expected
+
+
+def test_apply_mapping_one_to_one():
+    """
+    Test the case where every gene maps to exactly one
+    unique match
+    """
+    result = mapper_utils.apply_mapping(
+        gene_list=['a', 'b', 'c'],
+        mapping={'a': ['aa'], 'b': ['bb'], 'c': ['cc']},
+        assign_placeholders=True,
+        placeholder_prefix=None
+    )
+    assert result['gene_list'] == ['aa', 'bb', 'cc']
+    assert result['failure_log'] == {
+        'zero matches': 0,
+        'many matches': 0,
+        'degenerate matches': 0
+    }
@@ -142,3 +142,14 @@ def test_get_species_errors(
                 cursor=cursor,
                 species=1.7
             )
+
+
+def test_clamp_chunk_size():
+    max_vars = query_utils._max_variable_number()
+    assert query_utils.clamp_chunk_size(10) == 10
+    assert query_utils.clamp_chunk_size(10, n_fixed=4) == 10
+    assert query_utils.clamp_chunk_size(10*max_vars) == max_vars
+    assert (
+        query_utils.clamp_chunk_size(10*max_vars, n_fixed=4)
+        == max_vars - 4
+    )
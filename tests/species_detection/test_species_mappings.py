@@ -68,12 +68,32 @@ def species_mapping_db_fixture(tmp_dir_fixture):
     return db_path
 
 
-def test_map_from_identifiers(species_mapping_db_fixture):
+@pytest.mark.parametrize('chunk_size', [2, 200, None])
+@pytest.mark.parametrize('n_workers', [1, 3])
+@pytest.mark.parametrize('favor_or_chains', [True, False])
+def test_map_from_identifiers(
+        species_mapping_db_fixture,
+        chunk_size,
+        n_workers,
+        favor_or_chains,
+        monkeypatch):
+
+    monkeypatch.setattr(
+        species_detection,
+        '_FAVOR_OR_CHAINS',
+        favor_or_chains
+    )
+
+    gene_list = ['aaa', 'bbb', 'ccc', 'xxx', 'eee', 'ddd']
+    if chunk_size is None or chunk_size > 2:
+        # make sure we exercise the temporary table JOIN
+        gene_list += [f'dummy_{ii}' for ii in range(200)]
 
     actual = species_detection.species_from_identifier(
         db_path=species_mapping_db_fixture,
-        gene_list=['aaa', 'bbb', 'ccc', 'xxx', 'eee', 'ddd'],
-        chunk_size=2
+        gene_list=gene_list,
+        chunk_size=chunk_size,
+        n_workers=n_workers
     )
 
     assert len(actual) == 3
@@ -87,13 +107,24 @@ def test_map_from_identifiers(species_mapping_db_fixture):
     assert {'species_taxon': 1, 'authority': 'ENSEMBL'} in actual['ddd']
 
 
-def test_map_from_symbols(species_mapping_db_fixture):
+@pytest.mark.parametrize('chunk_size', [2, 200, None])
+@pytest.mark.parametrize('n_workers', [1, 3])
+def test_map_from_symbols(
+        species_mapping_db_fixture,
+        chunk_size,
+        n_workers):
+
+    gene_list = ['xxx', 'aaa', 'bbb', 'yyy',
+                 'ccc', 'zzz', 'ddd', 'eee', 'fff']
+    if chunk_size is None or chunk_size > 2:
+        # make sure we exercise the temporary table JOIN
+        gene_list += [f'dummy_{ii}' for ii in range(200)]
 
     actual = species_detection.species_from_symbol(
         db_path=species_mapping_db_fixture,
-        gene_list=['xxx', 'aaa', 'bbb', 'yyy',
-                   'ccc', 'zzz', 'ddd', 'eee', 'fff'],
-        chunk_size=2
+        gene_list=gene_list,
+        chunk_size=chunk_size,
+        n_workers=n_workers
     )
 
     assert len(actual) == 3
@@ -105,3 +136,308 @@ def test_map_from_symbols(species_mapping_db_fixture):
     assert len(actual['zzz']) == 2
     assert {'species_taxon': 1, 'authority': 'NCBI'} in actual['zzz']
     assert {'species_taxon': 0, 'authority': 'NCBI'} in actual['zzz']
+
+
+def test_species_mapping_cache(species_mapping_db_fixture):
+    """
+    Test that repeated lookups of the same genes against an
+    unmodified database are served from the cache, and that
+    modifying a returned result does not corrupt the cache
+    """
+    cache = species_detection.SpeciesLookupCache()
+    gene_list = ['aaa', 'bbb', 'ccc']
+    first = species_detection.species_from_identifier(
+        db_path=species_mapping_db_fixture,
+        gene_list=gene_list,
+        cache=cache
+    )
+    assert cache.misses == 1
+    second = species_detection.species_from_identifier(
+        db_path=species_mapping_db_fixture,
+        gene_list=list(gene_list),
+        cache=cache
+    )
+    assert cache.hits == 1
+    assert second == first
+    assert second is not first
+
+    # repeated genes do not matter
+    third = species_detection.species_from_identifier(
+        db_path=species_mapping_db_fixture,
+        gene_list=['aaa', 'bbb', 'aaa', 'ccc', 'bbb'],
+        cache=cache
+    )
+    assert cache.hits == 2
+    assert third == first
+
+    expected = {
+        gene: [dict(val) for val in matches]
+        for gene, matches in first.items()
+    }
+    first['aaa'].append({'species_taxon': 99, 'authority': 'NCBI'})
+    first['bbb'][0]['species_taxon'] = 99
+    first['ccc'] = []
+
+    fourth = species_detection.species_from_identifier(
+        db_path=species_mapping_db_fixture,
+        gene_list=gene_list,
+        cache=cache
+    )
+    assert cache.misses == 1
+    assert fourth == expected
+
+    # only the most recent lookups are kept
+    species_detection.species_from_symbol(
+        db_path=species_mapping_db_fixture,
+        gene_list=gene_list,
+        cache=cache
+    )
+    species_detection.species_from_identifier(
+        db_path=species_mapping_db_fixture,
+        gene_list=['aaa'],
+        cache=cache
+    )
+    assert len(cache) == 2
+    species_detection.species_from_identifier(
+        db_path=species_mapping_db_fixture,
+        gene_list=gene_list,
+        cache=cache
+    )
+    assert cache.misses == 4
+
+
+def test_species_mapping_read_only(species_mapping_db_fixture):
+    """
+    Test that the read-only results used by species detection
+    cannot be modified and match the public results
+    """
+    gene_list = ['aaa', 'bbb', 'ccc', 1, None]
+    expected = species_detection.species_from_identifier(
+        db_path=species_mapping_db_fixture,
+        gene_list=gene_list
+    )
+    actual = species_detection._species_from_column(
+        db_path=species_mapping_db_fixture,
+        gene_list=gene_list,
+        col_name='identifier',
+        chunk_size=None,
+        read_only=True,
+        cache=species_detection.SpeciesLookupCache()
+    )
+    assert {
+        gene: [dict(val) for val in matches]
+        for gene, matches in actual.items()
+    } == expected
+    with pytest.raises(TypeError):
+        actual['ccc'] = []
+    with pytest.raises(TypeError):
+        actual['aaa'][0]['species_taxon'] = 99
+
+
+def test_species_mapping_cache_or_chains(
+        species_mapping_db_fixture,
+        monkeypatch):
+    """
+    Test that changing _FAVOR_OR_CHAINS is not masked by the cache
+    """
+    cache = species_detection.SpeciesLookupCache()
+    for favor_or_chains in (False, True):
+        monkeypatch.setattr(
+            species_detection,
+            '_FAVOR_OR_CHAINS',
+            favor_or_chains
+        )
+        actual = species_detection.species_from_identifier(
+            db_path=species_mapping_db_fixture,
+            gene_list=['aaa', 'bbb', 'ccc'],
+            chunk_size=2,
+            cache=cache
+        )
+        assert len(actual) == 2
+    assert cache.misses == 2
+    assert cache.hits == 0
+
+
+def test_species_mapping_duplicate_genes(species_mapping_db_fixture):
+    """
+    Test that repeated genes in the input do not change the result
+    """
+    baseline = species_detection.species_from_symbol(
+        db_path=species_mapping_db_fixture,
+        gene_list=['xxx', 'yyy', 'eee'],
+        chunk_size=2
+    )
+    actual = species_detection.species_from_symbol(
+        db_path=species_mapping_db_fixture,
+        gene_list=['xxx', 'yyy', 'xxx', 'eee', 'yyy', 'xxx'],
+        chunk_size=2
+    )
+    assert actual == baseline
+    assert len(actual['xxx']) == 2
+
+
+@pytest.mark.parametrize(
+    "gene_list,chunk_size,expected",
+    [(['bbb'], 1000, True),
+     (['yyy'], 1000, True),
+     (['ccc', 'eee', 'fff'], 1000, False),
+     ([], 1000, False),
+     (['ccc', 'eee', 'fff', 'ggg', 'yyy'], 2, True),
+     (['ccc', 'eee', 'fff', 'ggg', 'hhh'], 2, False),
+     (['ccc', 'eee', 'bbb'], 2, True)]
+)
+def test_detect_if_genes(
+        species_mapping_db_fixture,
+        gene_list,
+        chunk_size,
+        expected):
+    """
+    Test that detect_if_genes finds genes that match either
+    an identifier ('bbb') or a symbol ('yyy'), including when
+    the match is in a final chunk shorter than chunk_size
+    """
+    actual = species_detection.detect_if_genes(
+        db_path=species_mapping_db_fixture,
+        gene_list=gene_list,
+        chunk_size=chunk_size
+    )
+    assert actual is expected
+
+
+@pytest.fixture(scope='session')
+def identifier_and_symbol_db_fixture(tmp_dir_fixture):
+    """
+    Create a database in which the same string is a gene
+    identifier in one species and a gene symbol in another
+    """
+    db_path = file_utils.mkstemp_clean(
+        dir=tmp_dir_fixture,
+        prefix="identifier_and_symbol_",
+        suffix=".db"
+    )
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            CREATE TABLE authority (
+                id INTEGER,
+                name TEXT
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE NCBI_species (
+                id INTEGER,
+                name TEXT
+            )
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE gene (
+                identifier TEXT,
+                symbol TEXT,
+                species_taxon INTEGER,
+                authority INTEGER,
+                citation INTEGER
+            )
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO authority (id, name)
+            VALUES
+                (0, 'NCBI'),
+                (1, 'ENSEMBL')
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO NCBI_species (id, name)
+            VALUES
+                (0, 'zero'),
+                (1, 'one')
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO gene (
+                identifier,
+                symbol,
+                species_taxon,
+                authority,
+                citation)
+            VALUES
+                ('ENSX0001', 'aaa', 0, 1, 1),
+                ('NCBIGene:5', 'ENSX0001', 1, 0, 1),
+                ('NCBIGene:6', 'bbb', 1, 0, 1)
+            """
+        )
+    return db_path
+
+
+def test_detect_species_identifier_and_symbol(
+        identifier_and_symbol_db_fixture):
+    """
+    Test that a gene which is an identifier in one species still
+    votes for the species in which it is a symbol.
+
+    'ENSX0001' is an identifier in species 0 and a symbol in
+    species 1, so it votes for both. 'bbb' is a symbol in species 1,
+    so species 1 wins (if 'ENSX0001' were not looked up as a symbol
+    there would be an unbreakable tie).
+    """
+    actual = species_detection.detect_species_and_authority(
+        db_path=identifier_and_symbol_db_fixture,
+        gene_list=['ENSX0001', 'bbb']
+    )
+    assert actual['species'].taxon == 1
+    assert actual['species'].name == 'one'
+    assert actual['authority'].tolist() == ['symbol', 'symbol']
+
+    # the species name is only looked up once, but every call
+    # gets its own Species
+    again = species_detection.detect_species_and_authority(
+        db_path=identifier_and_symbol_db_fixture,
+        gene_list=['ENSX0001', 'bbb']
+    )
+    assert again['species'] is not actual['species']
+    assert again['species'].serialize() == actual['species'].serialize()
+    cache_info = species_detection._get_species_name_cached.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 1
+
+
+def test_tally_species_votes():
+    """
+    Test that each gene votes for the taxon (or tied taxons) it
+    matches most often, once per occurrence in the gene list
+    """
+    from_identifier = {
+        'aaa': [{'species_taxon': 1, 'authority': 'NCBI'},
+                {'species_taxon': 2, 'authority': 'NCBI'}],
+        'bbb': [{'species_taxon': 2, 'authority': 'ENSEMBL'}]
+    }
+    from_symbol = {
+        'aaa': [{'species_taxon': 1, 'authority': 'NCBI'}],
+        'ccc': [{'species_taxon': 3, 'authority': 'NCBI'},
+                {'species_taxon': 2, 'authority': 'NCBI'}]
+    }
+    (votes,
+     cts) = species_detection._tally_species_votes(
+        gene_list=['aaa', 'bbb', 'ccc', 'bbb', 'ddd'],
+        from_identifier=from_identifier,
+        from_symbol=from_symbol
+    )
+    assert votes.tolist() == [1, 2, 3]
+    assert cts.tolist() == [1, 3, 1]
+
+    (votes,
+     cts) = species_detection._tally_species_votes(
+        gene_list=['ddd'],
+        from_identifier=from_identifier,
+        from_symbol=from_symbol
+    )
+    assert len(votes) == 0
+    assert len(cts) == 0
@@ -14,7 +14,8 @@ def test_assert_is_file(tmp_dir_fixture):
     file_utils.assert_is_file(actual_file)
 
 
-def test_hash_from_path(tmp_dir_fixture):
+@pytest.mark.parametrize('chunk_bytes', [None, 2, 100])
+def test_hash_from_path(tmp_dir_fixture, chunk_bytes):
 
     dst_path = file_utils.mkstemp_clean(
         dir=tmp_dir_fixture,
@@ -27,5 +28,5 @@ def test_hash_from_path(tmp_dir_fixture):
     with open(dst_path, 'rb') as src:
         expected.update(src.read())
 
-    actual = file_utils.hash_from_path(dst_path)
+    actual = file_utils.hash_from_path(dst_path, chunk_bytes=chunk_bytes)
     assert actual == f'md5:{expected.hexdigest()}'
@@ -4,8 +4,14 @@ NCBI data package and our simulated bkbit data package
 """
 import pytest
 
+import json
+import os
+import pathlib
 import sqlite3
+import tempfile
+import unittest.mock
 
+import mmc_gene_mapper.mapper.mapper as mapper
 import mmc_gene_mapper.metadata.classes as metadata_classes
 import mmc_gene_mapper.query_db.query as query_utils
 import mmc_gene_mapper.mapper.mapping_functions as mapping_functions
@@ -16,6 +22,33 @@ def test_get_all_authorities(mapper_fixture):
     assert set(actual) == set(['NCBI', 'ENSEMBL'])
 
 
+def test_create_mapper_with_download_mgr(
+        dummy_download_mgr_fixture,
+        tmp_dir_fixture):
+    """
+    Test that, when a DownloadManager is passed in, create_mapper
+    does not create (or leave behind) a download directory of its own
+    """
+    local_dir = tempfile.mkdtemp(dir=tmp_dir_fixture)
+    db_path = pathlib.Path(local_dir) / 'passed_mgr.db'
+    with unittest.mock.patch(
+            'tempfile.mkdtemp', wraps=tempfile.mkdtemp) as mkdtemp:
+        gene_mapper = mapper.MMCGeneMapper.create_mapper(
+            db_path=db_path,
+            local_dir=local_dir,
+            data_file_spec=None,
+            clobber=False,
+            force_download=False,
+            suppress_download_stdout=True,
+            download_mgr=dummy_download_mgr_fixture()
+        )
+    for call in mkdtemp.call_args_list:
+        assert 'downloads' not in call.kwargs.get('prefix', '')
+    assert 'NCBI' in gene_mapper.get_all_authorities()
+    gene_mapper.close()
+    assert os.listdir(local_dir) == ['passed_mgr.db']
+
+
 def test_get_all_species(mapper_fixture):
     actual = mapper_fixture.get_all_species()
     expected = [
@@ -120,6 +153,37 @@ def test_identifiers_from_symbols_mapping(
     assert actual['mapping'] == expected_mapping
 
 
+def test_identifiers_from_symbols_mapping_cache(mapper_fixture):
+    """
+    Test that repeated calls only look up the authority and
+    citation once, and that modifying the returned metadata
+    does not affect later calls
+    """
+    cache = query_utils._get_authority_and_citation_cached
+    species_obj = metadata_classes.Species(name='human', taxon=9606)
+
+    first = mapping_functions.identifiers_from_symbols_mapping(
+        db_path=mapper_fixture.db_path,
+        gene_symbol_list=["symbol:0", "nope"],
+        species=species_obj,
+        authority_name="NCBI"
+    )
+    assert first['mapping'] == {"symbol:0": ["NCBIGene:0"], "nope": []}
+    expected_metadata = json.loads(json.dumps(first['metadata']))
+    first['metadata']['citation']['name'] = 'corrupted'
+
+    second = mapping_functions.identifiers_from_symbols_mapping(
+        db_path=mapper_fixture.db_path,
+        gene_symbol_list=["symbol:6"],
+        species=species_obj,
+        authority_name="NCBI"
+    )
+    assert second['mapping'] == {"symbol:6": ["NCBIGene:6"]}
+    assert second['metadata'] == expected_metadata
+    assert cache.cache_info().misses == 1
+    assert cache.cache_info().hits == 1
+
+
 @pytest.mark.parametrize(
     "species, authority, symbol_list, expected_gene_list",
     [